@@ -9,24 +9,27 @@ Functions:
 Architecture:
 - Fetches data from FlightDeck ACE IoT API
 - Transforms and validates data
-- Upserts to Supabase PostgreSQL
+- Upserts to Supabase PostgreSQL (REST, or COPY when SUPABASE_DB_URL is set)
 - Comprehensive error handling and retry logic
 - Secrets management via Google Secret Manager
 """
 
 import os
-import json
+import math
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 import functions_framework
-from flask import Request, jsonify
+from flask import Request, Response
+import orjson
 import requests
-from google.cloud import secretmanager
 from supabase import create_client, Client
+from postgrest import ReturnMethod
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
@@ -48,13 +51,19 @@ class Config:
     ace_api_key: str = ""
     supabase_url: str = ""
     supabase_key: str = ""
+    supabase_db_url: str = ""
     default_site: str = "building-vitals-hq"
     page_size: int = 5000
-    upsert_batch_size: int = 250
+    upsert_batch_size: int = 2000
+    single_upsert_max_rows: int = 5000
     sync_window_minutes: int = 10
     max_retries: int = 3
     retry_delay_seconds: int = 2
     request_timeout: int = 30
+    max_concurrent_sites: int = 8
+    max_concurrent_windows: int = 8
+    backfill_window_hours: int = 24
+    point_cache_ttl_seconds: int = 3600
 
 # Global config instance
 config = Config()
@@ -66,16 +75,29 @@ config = Config()
 class SecretManager:
     """Manages access to Google Cloud Secret Manager"""
 
-    def __init__(self, project_id: Optional[str] = None):
+    def __init__(self, project_id: Optional[str] = None, cache_ttl_seconds: int = 3600):
         self.project_id = project_id or os.environ.get('GCP_PROJECT')
-        if self.project_id:
-            self.client = secretmanager.SecretManagerServiceClient()
-        else:
-            self.client = None
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._client = None
+        if not self.project_id:
             logger.warning("No GCP_PROJECT set - using environment variables only")
 
+    @property
+    def client(self):
+        """Secret Manager client, imported and built on first use to keep cold starts light"""
+        if self._client is None and self.project_id:
+            from google.cloud import secretmanager
+            self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
     def get_secret(self, secret_id: str, version: str = "latest") -> Optional[str]:
-        """Retrieve a secret from Secret Manager"""
+        """Retrieve a secret from Secret Manager, cached for cache_ttl_seconds"""
+        cache_key = (secret_id, version)
+        cached = self._cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl_seconds:
+            return cached[1]
+
         try:
             if not self.client:
                 return None
@@ -83,12 +105,17 @@ class SecretManager:
             name = f"projects/{self.project_id}/secrets/{secret_id}/versions/{version}"
             response = self.client.access_secret_version(request={"name": name})
             payload = response.payload.data.decode("UTF-8")
+            self._cache[cache_key] = (time.monotonic(), payload)
             logger.info(f"Successfully retrieved secret: {secret_id}")
             return payload
         except Exception as e:
             logger.error(f"Error retrieving secret {secret_id}: {e}")
             return None
 
+    def clear_cache(self) -> None:
+        """Forget cached secrets so the next get_secret reads Secret Manager"""
+        self._cache.clear()
+
 # Global secret manager instance
 secret_manager = SecretManager()
 
@@ -96,9 +123,20 @@ secret_manager = SecretManager()
 # Configuration Loader
 # ============================================================================
 
+# When the current config was loaded; None forces a reload
+_CONFIG_LOADED_AT: Optional[float] = None
+
 def load_config() -> Config:
-    """Load configuration from environment and Secret Manager"""
-    global config
+    """
+    Load configuration from environment and Secret Manager
+
+    Reused for the secret cache TTL, then reloaded so rotated secrets are
+    picked up; call reset_config_cache() to force a reload sooner.
+    """
+    global config, _CONFIG_LOADED_AT
+    if _CONFIG_LOADED_AT is not None and \
+            time.monotonic() - _CONFIG_LOADED_AT < secret_manager.cache_ttl_seconds:
+        return config
 
     # Try Secret Manager first, fallback to environment variables
     ace_api_key = (
@@ -116,14 +154,25 @@ def load_config() -> Config:
         os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
     )
 
+    # Optional direct Postgres connection string for bulk COPY loads
+    supabase_db_url = (
+        secret_manager.get_secret("SUPABASE_DB_URL") or
+        os.environ.get("SUPABASE_DB_URL", "")
+    )
+
     config = Config(
         ace_api_key=ace_api_key,
         supabase_url=supabase_url,
         supabase_key=supabase_key,
+        supabase_db_url=supabase_db_url,
         default_site=os.environ.get("DEFAULT_SITE", "building-vitals-hq"),
         page_size=int(os.environ.get("PAGE_SIZE", "5000")),
-        upsert_batch_size=int(os.environ.get("UPSERT_BATCH_SIZE", "250")),
+        upsert_batch_size=int(os.environ.get("UPSERT_BATCH_SIZE", "2000")),
         sync_window_minutes=int(os.environ.get("SYNC_WINDOW_MINUTES", "10")),
+        max_concurrent_sites=int(os.environ.get("MAX_CONCURRENT_SITES", "8")),
+        max_concurrent_windows=int(os.environ.get("MAX_CONCURRENT_WINDOWS", "8")),
+        backfill_window_hours=int(os.environ.get("BACKFILL_WINDOW_HOURS", "24")),
+        point_cache_ttl_seconds=int(os.environ.get("POINT_CACHE_TTL_SECONDS", "3600")),
     )
 
     # Validate required config
@@ -134,9 +183,15 @@ def load_config() -> Config:
     if not config.supabase_key:
         raise ValueError("SUPABASE_SERVICE_ROLE_KEY not configured")
 
+    _CONFIG_LOADED_AT = time.monotonic()
     logger.info(f"Configuration loaded: site={config.default_site}, page_size={config.page_size}")
     return config
 
+def reset_config_cache() -> None:
+    """Force the next load_config() call to reload from Secret Manager"""
+    global _CONFIG_LOADED_AT
+    _CONFIG_LOADED_AT = None
+
 # ============================================================================
 # HTTP Client with Retry Logic
 # ============================================================================
@@ -152,12 +207,26 @@ def create_http_session() -> requests.Session:
         allowed_methods=["GET", "POST"]
     )
 
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=20,
+        pool_maxsize=50
+    )
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
     return session
 
+# Module-level session - survives warm invocations so connections stay alive
+_http_session: Optional[requests.Session] = None
+
+def get_http_session() -> requests.Session:
+    """Get the shared HTTP session, creating it on first use"""
+    global _http_session
+    if _http_session is None:
+        _http_session = create_http_session()
+    return _http_session
+
 # ============================================================================
 # ACE API Client
 # ============================================================================
@@ -168,7 +237,7 @@ class ACEAPIClient:
     def __init__(self, api_key: str, base_url: str):
         self.api_key = api_key
         self.base_url = base_url
-        self.session = create_http_session()
+        self.session = get_http_session()
 
     def fetch_timeseries_page(
         self,
@@ -206,11 +275,20 @@ class ACEAPIClient:
                 url,
                 params=params,
                 headers=headers,
-                timeout=config.request_timeout
+                timeout=config.request_timeout,
+                stream=True
             )
 
-            response.raise_for_status()
-            data = response.json()
+            # Read the body straight off the socket so the raw bytes are not
+            # also kept on the response object alongside the parsed page
+            try:
+                if not response.ok:
+                    # Buffer the error body before close() so the handler can quote it
+                    _ = response.content
+                response.raise_for_status()
+                data = orjson.loads(response.raw.read(decode_content=True))
+            finally:
+                response.close()
 
             samples = data.get("point_samples", [])
             next_cursor = data.get("next_cursor")
@@ -242,7 +320,7 @@ class ACEAPIClient:
         try:
             response = self.session.get(url, headers=headers, timeout=config.request_timeout)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             sites = [site.get("name") for site in data.get("sites", []) if site.get("name")]
             logger.info(f"Found {len(sites)} sites")
             return sites
@@ -254,12 +332,29 @@ class ACEAPIClient:
 # Supabase Client
 # ============================================================================
 
+# Point id caches per site - survive warm invocations so the points table
+# is only re-read once point_cache_ttl_seconds has passed
+_POINT_CACHE: Dict[str, Tuple[float, Dict[str, int]]] = {}
+
+# Serializes point creation so concurrent backfill windows sharing a site's
+# cache do not insert the same new point twice
+_POINT_INSERT_LOCK = threading.Lock()
+
 class SupabaseClient:
     """Client for Supabase operations"""
 
-    def __init__(self, url: str, key: str):
-        self.client: Client = create_client(url, key)
+    def __init__(self, url: str, key: str, client: Optional[Client] = None):
+        self.client: Client = client or create_client(url, key)
         self.point_cache: Dict[str, int] = {}
+        self._pg_conn = None
+
+    def for_site(self) -> "SupabaseClient":
+        """Return a client sharing this one's PostgREST connection pool
+
+        The point cache and the COPY connection are per instance, so each
+        concurrently synced site or window gets its own copies of those.
+        """
+        return SupabaseClient("", "", client=self.client)
 
     def get_sites_from_db(self) -> List[str]:
         """Get unique site names from points table"""
@@ -273,23 +368,34 @@ class SupabaseClient:
             return []
 
     def load_point_cache(self, site: str) -> None:
-        """Load point ID cache for a site"""
+        """Load point ID cache for a site, reusing the container-level copy while fresh"""
+        cached = _POINT_CACHE.get(site)
+        if cached and time.monotonic() - cached[0] < config.point_cache_ttl_seconds:
+            # Shared dict - points created by upsert_points land in both caches
+            self.point_cache = cached[1]
+            logger.info(f"Reusing point cache for site: {site} ({len(self.point_cache)} points)")
+            return
+
         try:
             logger.info(f"Loading point cache for site: {site}")
             response = self.client.table("points").select("id, name").eq("site_name", site).execute()
 
-            self.point_cache.clear()
-            for point in response.data:
-                self.point_cache[point["name"]] = point["id"]
+            self.point_cache = {point["name"]: point["id"] for point in response.data}
+            _POINT_CACHE[site] = (time.monotonic(), self.point_cache)
 
             logger.info(f"Loaded {len(self.point_cache)} points into cache")
         except Exception as e:
             logger.error(f"Error loading point cache: {e}")
-            self.point_cache.clear()
+            self.point_cache = {}
 
     def upsert_points(self, site: str, point_names: List[str]) -> None:
         """Create new points if they don't exist"""
-        new_points = [name for name in point_names if name not in self.point_cache]
+        with _POINT_INSERT_LOCK:
+            self._insert_points(site, point_names)
+
+    def _insert_points(self, site: str, point_names: List[str]) -> None:
+        """Insert the points missing from the cache and cache their ids"""
+        new_points = set(point_names).difference(self.point_cache)
 
         if not new_points:
             return
@@ -306,10 +412,8 @@ class SupabaseClient:
         ]
 
         try:
-            self.client.table("points").insert(point_rows).execute()
-
-            # Refresh cache for new points
-            response = self.client.table("points").select("id, name").eq("site_name", site).in_("name", new_points).execute()
+            # PostgREST returns the inserted rows (with generated ids) by default
+            response = self.client.table("points").insert(point_rows).execute()
 
             for point in response.data:
                 self.point_cache[point["name"]] = point["id"]
@@ -318,99 +422,226 @@ class SupabaseClient:
         except Exception as e:
             logger.error(f"Error upserting points: {e}")
 
+    def _get_pg_connection(self):
+        """Open (or reuse) the direct Postgres connection used for COPY"""
+        if self._pg_conn is None or self._pg_conn.closed:
+            import psycopg
+            self._pg_conn = psycopg.connect(config.supabase_db_url)
+        return self._pg_conn
+
+    def _close_pg_connection(self) -> None:
+        """Drop the Postgres connection so the next COPY reconnects"""
+        if self._pg_conn is not None:
+            try:
+                self._pg_conn.close()
+            except Exception:
+                pass
+            self._pg_conn = None
+
+    def close(self) -> None:
+        """Release the Postgres connection held for COPY, if any"""
+        self._close_pg_connection()
+
+    def copy_timeseries(self, samples: List[Dict]) -> int:
+        """
+        Bulk load timeseries with COPY into a staging table, then merge
+
+        One COPY stream plus one INSERT ... ON CONFLICT replaces the
+        per-batch PostgREST round-trips. Samples must already be
+        deduplicated on (point_id, ts).
+        """
+        conn = self._get_pg_connection()
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(
+                    "CREATE TEMP TABLE ts_stage "
+                    "(point_id bigint, ts timestamptz, value double precision) "
+                    "ON COMMIT DROP"
+                )
+                with cur.copy("COPY ts_stage (point_id, ts, value) FROM STDIN") as copy:
+                    for sample in samples:
+                        copy.write_row((sample["point_id"], sample["ts"], sample["value"]))
+                cur.execute(
+                    "INSERT INTO timeseries (point_id, ts, value) "
+                    "SELECT point_id, ts, value FROM ts_stage "
+                    "ON CONFLICT (point_id, ts) DO UPDATE SET value = EXCLUDED.value"
+                )
+        return len(samples)
+
     def upsert_timeseries(self, samples: List[Dict]) -> int:
-        """Upsert timeseries data in batches"""
+        """Upsert timeseries data via COPY when configured, else REST batches"""
         if not samples:
             return 0
 
+        if config.supabase_db_url:
+            try:
+                copied = self.copy_timeseries(samples)
+                logger.info(f"Copied {copied} samples via Postgres COPY")
+                return copied
+            except Exception as e:
+                logger.error(f"Error copying timeseries, falling back to REST upsert: {e}")
+                self._close_pg_connection()
+
         total_inserted = 0
 
-        # Process in batches
-        for i in range(0, len(samples), config.upsert_batch_size):
-            batch = samples[i:i + config.upsert_batch_size]
+        # Send the whole page in one request when it fits, else fixed-size batches
+        if len(samples) <= config.single_upsert_max_rows:
+            full_batch_size = len(samples)
+        else:
+            full_batch_size = config.upsert_batch_size
+        batch_size = full_batch_size
+        # End of the rows covered by the batch that was last rejected as too large
+        split_end = 0
+
+        i = 0
+        while i < len(samples):
+            batch = samples[i:i + batch_size]
 
             try:
+                # Rows are not read back, so skip the response body
                 self.client.table("timeseries").upsert(
                     batch,
-                    on_conflict="point_id,ts"
+                    on_conflict="point_id,ts",
+                    returning=ReturnMethod.minimal
                 ).execute()
                 total_inserted += len(batch)
-                logger.info(f"Upserted batch {i//config.upsert_batch_size + 1}: {len(batch)} samples")
+                logger.info(f"Upserted batch at index {i}: {len(batch)} samples")
+                if i + len(batch) >= split_end:
+                    # The oversized span is written; go back to full-size batches
+                    batch_size = full_batch_size
             except Exception as e:
+                if is_payload_too_large(e) and batch_size > 1:
+                    split_end = max(split_end, i + len(batch))
+                    batch_size = max(1, batch_size // 2)
+                    logger.warning(f"Upsert payload too large, retrying with batch size {batch_size}")
+                    continue
                 logger.error(f"Error upserting batch at index {i}: {e}")
 
+            i += len(batch)
+
         return total_inserted
 
+def is_payload_too_large(error: Exception) -> bool:
+    """Check whether a PostgREST error was caused by an oversized request body"""
+    # APIError carries the HTTP status as its code when the body isn't PostgREST JSON
+    if str(getattr(error, "code", "")) == "413":
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 413:
+        return True
+    # Bare "413" is not enough: ids, values and timestamps can contain it
+    message = str(error).lower()
+    return "payload too large" in message or "request entity too large" in message
+
 # ============================================================================
 # Data Processing
 # ============================================================================
 
+NAME_KEYS = ("name", "point", "point_name")
+TIME_KEYS = ("time", "timestamp", "ts")
+
+def detect_sample_key(sample: Dict, candidates: Tuple[str, ...]) -> str:
+    """Pick the first candidate key present on a sample"""
+    for key in candidates:
+        if sample.get(key):
+            return key
+    return candidates[0]
+
 def transform_samples(
     raw_samples: List[Dict],
     point_cache: Dict[str, int]
 ) -> List[Dict]:
     """
-    Transform ACE API samples to Supabase format
+    Transform ACE API samples to Supabase format and drop duplicates
 
     Input format: {name, time, value}
-    Output format: {point_id, ts, value}
+    Output format: {point_id, ts, value}, unique on (point_id, ts) - last sample wins
     """
-    transformed = []
+    rows: Dict[Tuple[int, str], Dict] = {}
+    parsed_times: Dict[Any, str] = {}
     skipped = 0
+    total = 0
+
+    # The payload schema is consistent per deployment - detect the key names
+    # once and only fall back to the full lookup chain when a row differs
+    first = raw_samples[0] if raw_samples else {}
+    name_key = detect_sample_key(first, NAME_KEYS)
+    time_key = detect_sample_key(first, TIME_KEYS)
+
+    # Local bindings keep attribute lookups out of the per-sample loop
+    get_point_id = point_cache.get
+    fromtimestamp = datetime.fromtimestamp
+    fromisoformat = datetime.fromisoformat
+    isnan = math.isnan
 
     for sample in raw_samples:
-        name = sample.get("name") or sample.get("point") or sample.get("point_name")
-        time_val = sample.get("time") or sample.get("timestamp") or sample.get("ts")
-        value = sample.get("value")
+        total += 1
+        get = sample.get
+        name = get(name_key) or get("name") or get("point") or get("point_name")
+        time_val = get(time_key) or get("time") or get("timestamp") or get("ts")
+        value = get("value")
 
         if not name:
             skipped += 1
             continue
 
-        point_id = point_cache.get(name)
+        point_id = get_point_id(name)
         if not point_id:
             skipped += 1
             continue
 
-        # Parse timestamp
+        # Parse timestamp - points sampled together share timestamps,
+        # so each distinct value is parsed once per page
         try:
-            if isinstance(time_val, (int, float)):
-                timestamp = datetime.fromtimestamp(time_val / 1000.0)
-            else:
-                timestamp = datetime.fromisoformat(time_val.replace('Z', '+00:00'))
-        except Exception:
+            ts = parsed_times[time_val]
+        except KeyError:
+            try:
+                if isinstance(time_val, (int, float)):
+                    ts = fromtimestamp(time_val / 1000.0).isoformat()
+                elif time_val.endswith('Z'):
+                    # ACE's UTC ISO 8601 - validate and forward as-is, Postgres parses it
+                    fromisoformat(time_val)
+                    ts = time_val
+                else:
+                    ts = fromisoformat(time_val).isoformat()
+            except Exception:
+                skipped += 1
+                continue
+            parsed_times[time_val] = ts
+        except TypeError:
             skipped += 1
             continue
 
         # Parse value
         try:
             numeric_value = float(value)
-            if not (numeric_value == numeric_value):  # Check for NaN
-                skipped += 1
-                continue
         except Exception:
             skipped += 1
             continue
+        if isnan(numeric_value):
+            skipped += 1
+            continue
 
-        transformed.append({
+        rows[(point_id, ts)] = {
             "point_id": point_id,
-            "ts": timestamp.isoformat(),
+            "ts": ts,
             "value": numeric_value
-        })
+        }
 
     if skipped > 0:
         logger.warning(f"Skipped {skipped} invalid samples")
 
-    return transformed
+    duplicates_removed = total - skipped - len(rows)
+    if duplicates_removed > 0:
+        logger.info(f"Removed {duplicates_removed} duplicate samples")
+
+    return list(rows.values())
 
 def deduplicate_samples(samples: List[Dict]) -> List[Dict]:
-    """Remove duplicate samples by (point_id, ts)"""
-    seen = {}
-    for sample in samples:
-        key = (sample["point_id"], sample["ts"])
-        seen[key] = sample
+    """Remove duplicate samples by (point_id, ts), keeping the last occurrence"""
+    # Later samples overwrite earlier ones under the same key in a single pass
+    unique = list({(s["point_id"], s["ts"]): s for s in samples}.values())
 
-    unique = list(seen.values())
     duplicates_removed = len(samples) - len(unique)
 
     if duplicates_removed > 0:
@@ -444,63 +675,74 @@ def sync_site(
     total_samples = 0
     total_inserted = 0
     pages_fetched = 0
-    cursor = None
     unique_points = set()
 
-    # Fetch and process pages
-    while pages_fetched < max_pages:
-        # Fetch page from ACE API
-        raw_samples, next_cursor, error = ace_client.fetch_timeseries_page(
-            site, start_time, end_time, cursor
-        )
+    # Fetch and process pages. The next page is requested as soon as its
+    # cursor is known so the ACE fetch overlaps the Supabase upsert.
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = None
+        if max_pages > 0:
+            pending = prefetcher.submit(
+                ace_client.fetch_timeseries_page, site, start_time, end_time, None
+            )
 
-        if error:
-            return {
-                "site": site,
-                "samples": total_samples,
-                "inserted": total_inserted,
-                "unique_points": len(unique_points),
-                "pages": pages_fetched,
-                "error": error
-            }
+        while pending is not None:
+            raw_samples, next_cursor, error = pending.result()
+            pending = None
 
-        if not raw_samples:
-            if not next_cursor:
+            if error:
+                return {
+                    "site": site,
+                    "samples": total_samples,
+                    "inserted": total_inserted,
+                    "unique_points": len(unique_points),
+                    "pages": pages_fetched,
+                    "error": error
+                }
+
+            if not raw_samples and not next_cursor:
                 break
-            cursor = next_cursor
+
             pages_fetched += 1
-            continue
 
-        # Track unique points
-        for sample in raw_samples:
-            name = sample.get("name") or sample.get("point")
-            if name:
-                unique_points.add(name)
+            # Prefetch next page from ACE API
+            if next_cursor and pages_fetched < max_pages:
+                pending = prefetcher.submit(
+                    ace_client.fetch_timeseries_page, site, start_time, end_time, next_cursor
+                )
 
-        # Create new points if needed
-        supabase_client.upsert_points(site, list(unique_points))
+            if not raw_samples:
+                continue
 
-        # Transform samples
-        transformed = transform_samples(raw_samples, supabase_client.point_cache)
-        total_samples += len(raw_samples)
+            # Track unique points
+            page_points = set()
+            for sample in raw_samples:
+                name = sample.get("name") or sample.get("point")
+                if name:
+                    page_points.add(name)
+            unique_points |= page_points
 
-        # Deduplicate
-        unique_samples = deduplicate_samples(transformed)
+            # Create only the points first seen on this page
+            point_cache = supabase_client.point_cache
+            new_points = list(page_points.difference(point_cache))
+            if new_points:
+                supabase_client.upsert_points(site, new_points)
 
-        # Upsert to Supabase
-        if unique_samples:
-            inserted = supabase_client.upsert_timeseries(unique_samples)
-            total_inserted += inserted
+            # Transform and deduplicate samples in a single pass
+            unique_samples = transform_samples(raw_samples, supabase_client.point_cache)
+            total_samples += len(raw_samples)
 
-        cursor = next_cursor
-        pages_fetched += 1
+            # Release the raw page before the upsert - only the transformed rows are needed
+            del raw_samples
 
-        if not cursor:
-            break
+            # Upsert to Supabase
+            if unique_samples:
+                inserted = supabase_client.upsert_timeseries(unique_samples)
+                total_inserted += inserted
 
-        # Progress logging
-        if pages_fetched % 10 == 0:
-            logger.info(f"Page {pages_fetched}: {total_samples} samples, {total_inserted} inserted")
+            # Progress logging
+            if pending is not None and pages_fetched % 10 == 0:
+                logger.info(f"Page {pages_fetched}: {total_samples} samples, {total_inserted} inserted")
 
     return {
         "site": site,
@@ -510,10 +752,89 @@ def sync_site(
         "pages": pages_fetched
     }
 
+def sync_site_isolated(
+    ace_client: ACEAPIClient,
+    supabase_client: SupabaseClient,
+    site: str,
+    start_time: str,
+    end_time: str,
+    max_pages: int = 100
+) -> Dict[str, Any]:
+    """
+    Sync a single site through a per-site view of the shared Supabase client
+
+    Safe to run from a worker thread: the point cache lives on the
+    SupabaseClient, so every site gets its own view (sharing the HTTP
+    connection pool). Its Postgres connection is closed when the site is
+    done instead of waiting for GC.
+    """
+    site_client = None
+    try:
+        site_client = supabase_client.for_site()
+        result = sync_site(
+            ace_client,
+            site_client,
+            site,
+            start_time,
+            end_time,
+            max_pages=max_pages
+        )
+        logger.info(f"Site {site}: {result['inserted']} samples inserted")
+        return result
+    except Exception as e:
+        logger.error(f"Error syncing site {site}: {e}")
+        return {
+            "site": site,
+            "samples": 0,
+            "inserted": 0,
+            "unique_points": 0,
+            "pages": 0,
+            "error": str(e)
+        }
+    finally:
+        if site_client is not None:
+            site_client.close()
+
+def split_time_range(
+    start_dt: datetime,
+    end_dt: datetime,
+    step: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """Split [start_dt, end_dt) into consecutive windows of at most step"""
+    windows = []
+    window_start = start_dt
+    while window_start < end_dt:
+        window_end = min(window_start + step, end_dt)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
 # ============================================================================
 # Cloud Functions
 # ============================================================================
 
+# Clients reused across warm invocations, rebuilt if the credentials change
+_ACE: Optional[ACEAPIClient] = None
+_SB: Optional[SupabaseClient] = None
+_CLIENTS_STAMP: Optional[Tuple[str, ...]] = None
+
+def get_clients() -> Tuple[ACEAPIClient, SupabaseClient]:
+    """Load configuration and return the container's ACE and Supabase clients"""
+    global _ACE, _SB, _CLIENTS_STAMP
+    load_config()
+
+    stamp = (config.ace_api_key, config.ace_api_base, config.supabase_url, config.supabase_key)
+    if _ACE is None or _SB is None or stamp != _CLIENTS_STAMP:
+        _ACE = ACEAPIClient(config.ace_api_key, config.ace_api_base)
+        _SB = SupabaseClient(config.supabase_url, config.supabase_key)
+        _CLIENTS_STAMP = stamp
+    return _ACE, _SB
+
+def json_response(payload: Dict) -> Response:
+    """Serialize a response body with orjson (faster than jsonify for large results)"""
+    return Response(orjson.dumps(payload), mimetype="application/json")
+
+
 @functions_framework.http
 def continuous_sync(request: Request):
     """
@@ -529,12 +850,8 @@ def continuous_sync(request: Request):
         logger.info("CONTINUOUS SYNC STARTED")
         logger.info("="*80)
 
-        # Load configuration
-        load_config()
-
-        # Initialize clients
-        ace_client = ACEAPIClient(config.ace_api_key, config.ace_api_base)
-        supabase_client = SupabaseClient(config.supabase_url, config.supabase_key)
+        # Load configuration and clients
+        ace_client, supabase_client = get_clients()
 
         # Calculate time window (last 10 minutes with overlap)
         end_dt = datetime.utcnow()
@@ -552,30 +869,26 @@ def continuous_sync(request: Request):
 
         logger.info(f"Processing {len(sites)} sites: {', '.join(sites)}")
 
-        # Process each site
+        # Process sites concurrently - each site is dominated by network I/O
+        max_workers = max(1, min(config.max_concurrent_sites, len(sites)))
         results = []
-        for site in sites:
-            try:
-                result = sync_site(
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    sync_site_isolated,
                     ace_client,
                     supabase_client,
                     site,
                     start_iso,
                     end_iso,
                     max_pages=100  # Limit for continuous sync
-                )
+                ): site
+                for site in sites
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                logger.info(f"Site {futures[future]} finished: {result['inserted']} inserted")
                 results.append(result)
-                logger.info(f"Site {site}: {result['inserted']} samples inserted")
-            except Exception as e:
-                logger.error(f"Error syncing site {site}: {e}")
-                results.append({
-                    "site": site,
-                    "samples": 0,
-                    "inserted": 0,
-                    "unique_points": 0,
-                    "pages": 0,
-                    "error": str(e)
-                })
 
         # Calculate totals
         total_samples = sum(r["samples"] for r in results)
@@ -588,7 +901,7 @@ def continuous_sync(request: Request):
         logger.info(f"Sites: {len(results)}, Samples: {total_samples}, Inserted: {total_inserted}, Failed: {failed_sites}")
         logger.info("="*80)
 
-        return jsonify({
+        return json_response({
             "success": failed_sites == 0,
             "time_window": f"{start_iso} -> {end_iso}",
             "sites_processed": len(results),
@@ -600,7 +913,7 @@ def continuous_sync(request: Request):
 
     except Exception as e:
         logger.error(f"Continuous sync error: {e}", exc_info=True)
-        return jsonify({
+        return json_response({
             "success": False,
             "error": str(e)
         }), 500
@@ -617,7 +930,7 @@ def backfill_historical(request: Request):
         "site": "site-name",  # Optional, defaults to configured site
         "start_date": "2024-01-01",  # Required
         "end_date": "2024-01-31",  # Required
-        "max_pages": 1000  # Optional, defaults to 1000
+        "max_pages": 1000  # Optional, per window, defaults to 1000
     }
 
     Returns:
@@ -646,13 +959,13 @@ def backfill_historical(request: Request):
 
         # Validate required parameters
         if not start_date or not end_date:
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": "Missing required parameters: start_date and end_date"
             }), 400
 
-        # Load configuration
-        load_config()
+        # Load configuration and clients
+        ace_client, supabase_client = get_clients()
 
         site = site or config.default_site
 
@@ -663,27 +976,45 @@ def backfill_historical(request: Request):
 
             start_iso = start_dt.isoformat() + "Z"
             end_iso = end_dt.isoformat() + "Z"
+            windows = split_time_range(
+                start_dt, end_dt, timedelta(hours=config.backfill_window_hours)
+            )
         except Exception as e:
-            return jsonify({
+            return json_response({
                 "success": False,
                 "error": f"Invalid date format: {e}"
             }), 400
 
         logger.info(f"Backfill request: site={site}, range={start_iso} -> {end_iso}")
 
-        # Initialize clients
-        ace_client = ACEAPIClient(config.ace_api_key, config.ace_api_base)
-        supabase_client = SupabaseClient(config.supabase_url, config.supabase_key)
+        # Warm the shared point cache once so the windows don't all query it
+        supabase_client.load_point_cache(site)
 
-        # Perform backfill
-        result = sync_site(
-            ace_client,
-            supabase_client,
-            site,
-            start_iso,
-            end_iso,
-            max_pages=max_pages
-        )
+        # Each window has its own cursor stream, so windows run concurrently
+        logger.info(f"Backfilling {len(windows)} windows of {config.backfill_window_hours}h")
+        max_workers = max(1, min(config.max_concurrent_windows, len(windows)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window_results = list(executor.map(
+                lambda window: sync_site_isolated(
+                    ace_client,
+                    supabase_client,
+                    site,
+                    window[0].isoformat() + "Z",
+                    window[1].isoformat() + "Z",
+                    max_pages=max_pages  # Applies per window
+                ),
+                windows
+            ))
+
+        errors = [r["error"] for r in window_results if r.get("error")]
+        result = {
+            "samples": sum(r["samples"] for r in window_results),
+            "inserted": sum(r["inserted"] for r in window_results),
+            # Windows report their own counts; the largest is a lower bound
+            "unique_points": max((r["unique_points"] for r in window_results), default=0),
+            "pages": sum(r["pages"] for r in window_results),
+            "error": "; ".join(errors) if errors else None
+        }
 
         duration = time.time() - start_time
 
@@ -692,7 +1023,7 @@ def backfill_historical(request: Request):
         logger.info(f"Site: {site}, Samples: {result['samples']}, Inserted: {result['inserted']}")
         logger.info("="*80)
 
-        return jsonify({
+        return json_response({
             "success": not result.get("error"),
             "site": site,
             "time_range": f"{start_iso} -> {end_iso}",
@@ -706,7 +1037,7 @@ def backfill_historical(request: Request):
 
     except Exception as e:
         logger.error(f"Historical backfill error: {e}", exc_info=True)
-        return jsonify({
+        return json_response({
             "success": False,
             "error": str(e)
         }), 500
@@ -718,17 +1049,38 @@ def backfill_historical(request: Request):
 
 @functions_framework.http
 def health_check(request: Request):
-    """Health check endpoint"""
+    """Health check endpoint - only loads config on a cold container"""
     try:
-        load_config()
-        return jsonify({
+        if not config.ace_api_key:
+            load_config()
+        return json_response({
             "status": "healthy",
             "service": "building-vitals-functions",
             "version": "1.0.0",
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }), 200
     except Exception as e:
-        return jsonify({
+        return json_response({
             "status": "unhealthy",
             "error": str(e)
         }), 500
+
+
+@functions_framework.http
+def readiness_check(request: Request):
+    """Readiness endpoint - reloads config from Secret Manager on every call"""
+    try:
+        # Bypass both caches so a rotated or revoked secret shows up here
+        secret_manager.clear_cache()
+        reset_config_cache()
+        load_config()
+        return json_response({
+            "status": "ready",
+            "service": "building-vitals-functions",
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        }), 200
+    except Exception as e:
+        return json_response({
+            "status": "not_ready",
+            "error": str(e)
+        }), 503
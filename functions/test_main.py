@@ -1,13 +1,19 @@
 """
 Unit tests for Firebase Cloud Functions
 Run with: pytest test_main.py -v
+In parallel: pytest test_main.py -n auto --dist loadgroup
 """
 
+import io
 import os
 import json
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
 import pytest
+import requests
+import responses
+import urllib3
+from postgrest.exceptions import APIError
 
 # Set environment variables before importing main
 os.environ['ACE_API_KEY'] = 'test-key'
@@ -18,10 +24,25 @@ os.environ['GCP_PROJECT'] = 'test-project'
 import main
 
 
+class _Chain:
+    """Minimal stand-in for the supabase query builder chain"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def table(self, *args, **kwargs):
+        return self
+
+    select = eq = table
+
+    def execute(self):
+        return self
+
+
 class TestSecretManager:
     """Test Secret Manager integration"""
 
-    @patch('main.secretmanager.SecretManagerServiceClient')
+    @patch('google.cloud.secretmanager.SecretManagerServiceClient')
     def test_get_secret_success(self, mock_client):
         """Test successful secret retrieval"""
         mock_response = Mock()
@@ -34,6 +55,33 @@ class TestSecretManager:
 
         assert result == "secret-value"
 
+    @patch('google.cloud.secretmanager.SecretManagerServiceClient')
+    def test_get_secret_cached(self, mock_client):
+        """Test repeated lookups are served from the cache"""
+        mock_response = Mock()
+        mock_response.payload.data.decode.return_value = "secret-value"
+
+        mock_client.return_value.access_secret_version.return_value = mock_response
+
+        sm = main.SecretManager(project_id="test-project")
+        assert sm.get_secret("TEST_SECRET") == "secret-value"
+        assert sm.get_secret("TEST_SECRET") == "secret-value"
+
+        assert mock_client.return_value.access_secret_version.call_count == 1
+
+    @patch('google.cloud.secretmanager.SecretManagerServiceClient')
+    def test_clear_cache_refetches_secret(self, mock_client):
+        """Test a cleared cache reads the (possibly rotated) secret again"""
+        mock_response = Mock()
+        mock_response.payload.data.decode.side_effect = ["old-value", "new-value"]
+
+        mock_client.return_value.access_secret_version.return_value = mock_response
+
+        sm = main.SecretManager(project_id="test-project")
+        assert sm.get_secret("TEST_SECRET") == "old-value"
+        sm.clear_cache()
+        assert sm.get_secret("TEST_SECRET") == "new-value"
+
     def test_get_secret_no_client(self):
         """Test secret retrieval without client"""
         sm = main.SecretManager(project_id=None)
@@ -53,42 +101,62 @@ class TestConfig:
         assert config.supabase_url == "https://test.supabase.co"
         assert config.supabase_key == "test-service-key"
 
+    @pytest.mark.xdist_group("env_mutation")
     def test_config_validation(self):
         """Test configuration validation"""
         # Remove required environment variable
         old_value = os.environ.pop('ACE_API_KEY', None)
+        main.reset_config_cache()
+
+        try:
+            with pytest.raises(ValueError, match="ACE_API_KEY not configured"):
+                main.load_config()
+        finally:
+            # Restore
+            if old_value:
+                os.environ['ACE_API_KEY'] = old_value
+            main.reset_config_cache()
+
+    def test_load_config_cached(self):
+        """Test repeated loads reuse the cached config"""
+        main.reset_config_cache()
+
+        assert main.load_config() is main.load_config()
 
-        with pytest.raises(ValueError, match="ACE_API_KEY not configured"):
-            main.load_config()
+    def test_load_config_reloads_after_secret_ttl(self):
+        """Test a config older than the secret cache TTL is reloaded"""
+        main.reset_config_cache()
+        first = main.load_config()
 
-        # Restore
-        if old_value:
-            os.environ['ACE_API_KEY'] = old_value
+        with patch.object(main.secret_manager, "cache_ttl_seconds", 0):
+            assert main.load_config() is not first
 
 
 class TestACEAPIClient:
     """Test ACE API client"""
 
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def ace_client(self):
-        """Create ACE API client fixture"""
+        """Create ACE API client fixture (stateless, shared by all tests)"""
         return main.ACEAPIClient(
             api_key="test-key",
             base_url="https://test.aceiot.cloud/api"
         )
 
-    @patch('requests.Session.get')
-    def test_fetch_timeseries_success(self, mock_get, ace_client):
+    @responses.activate
+    def test_fetch_timeseries_success(self, ace_client):
         """Test successful timeseries fetch"""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "point_samples": [
-                {"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 123.45}
-            ],
-            "next_cursor": "next-page"
-        }
-        mock_get.return_value = mock_response
+        responses.add(
+            responses.GET,
+            "https://test.aceiot.cloud/api/sites/test-site/timeseries/paginated",
+            json={
+                "point_samples": [
+                    {"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 123.45}
+                ],
+                "next_cursor": "next-page"
+            },
+            status=200
+        )
 
         samples, cursor, error = ace_client.fetch_timeseries_page(
             site="test-site",
@@ -101,14 +169,15 @@ class TestACEAPIClient:
         assert cursor == "next-page"
         assert error is None
 
-    @patch('requests.Session.get')
-    def test_fetch_timeseries_http_error(self, mock_get, ace_client):
+    @responses.activate
+    def test_fetch_timeseries_http_error(self, ace_client):
         """Test HTTP error handling"""
-        mock_response = Mock()
-        mock_response.status_code = 401
-        mock_response.text = "Unauthorized"
-        mock_response.raise_for_status.side_effect = Exception("HTTP Error")
-        mock_get.return_value = mock_response
+        responses.add(
+            responses.GET,
+            "https://test.aceiot.cloud/api/sites/test-site/timeseries/paginated",
+            body="Unauthorized",
+            status=401
+        )
 
         samples, cursor, error = ace_client.fetch_timeseries_page(
             site="test-site",
@@ -119,33 +188,86 @@ class TestACEAPIClient:
         assert len(samples) == 0
         assert cursor is None
         assert error is not None
+        assert "401" in error
+
+    def test_fetch_timeseries_http_error_keeps_streamed_body(self, ace_client):
+        """Test the error message quotes the body of a streamed, unbuffered error response"""
+        raw = urllib3.HTTPResponse(
+            body=io.BytesIO(b'{"error": "token expired"}'), status=401, preload_content=False
+        )
+        response = requests.Response()
+        response.status_code = 401
+        response.reason = "Unauthorized"
+        response.url = "https://test.aceiot.cloud/api/sites/test-site/timeseries/paginated"
+        response.raw = raw
+
+        with patch.object(ace_client.session, "get", return_value=response):
+            samples, cursor, error = ace_client.fetch_timeseries_page(
+                site="test-site",
+                start_time="2024-01-01T00:00:00Z",
+                end_time="2024-01-01T01:00:00Z"
+            )
+
+        assert samples == []
+        assert "401" in error
+        assert "token expired" in error
+
+    @responses.activate
+    def test_fetch_timeseries_retries_server_error(self, ace_client):
+        """Test a 503 is retried by the session's Retry adapter before succeeding"""
+        url = "https://test.aceiot.cloud/api/sites/test-site/timeseries/paginated"
+        responses.add(responses.GET, url, body="Service Unavailable", status=503)
+        responses.add(
+            responses.GET,
+            url,
+            json={
+                "point_samples": [
+                    {"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 1.5}
+                ],
+                "next_cursor": None
+            },
+            status=200
+        )
+
+        samples, cursor, error = ace_client.fetch_timeseries_page(
+            site="test-site",
+            start_time="2024-01-01T00:00:00Z",
+            end_time="2024-01-01T01:00:00Z"
+        )
+
+        assert len(responses.calls) == 2
+        assert [c.response.status_code for c in responses.calls] == [503, 200]
+        assert error is None
+        assert samples[0]["value"] == 1.5
+        assert cursor is None
+
+
+@pytest.fixture(scope="module")
+def supabase_client():
+    """Create Supabase client fixture once for the module"""
+    with patch('main.create_client', return_value=Mock()):
+        return main.SupabaseClient(
+            url="https://test.supabase.co",
+            key="test-key"
+        )
 
 
 class TestSupabaseClient:
     """Test Supabase client"""
 
-    @pytest.fixture
-    def supabase_client(self):
-        """Create Supabase client fixture"""
-        with patch('main.create_client') as mock_create:
-            mock_client = Mock()
-            mock_create.return_value = mock_client
-
-            client = main.SupabaseClient(
-                url="https://test.supabase.co",
-                key="test-key"
-            )
-            return client
+    @pytest.fixture(autouse=True)
+    def reset_supabase_client(self, supabase_client):
+        """Give each test a fresh mock client and an empty point cache"""
+        supabase_client.client = Mock()
+        supabase_client.point_cache = {}
 
     def test_load_point_cache(self, supabase_client):
         """Test loading point cache"""
-        mock_response = Mock()
-        mock_response.data = [
+        main._POINT_CACHE.clear()
+        supabase_client.client = _Chain([
             {"id": 1, "name": "point1"},
             {"id": 2, "name": "point2"}
-        ]
-
-        supabase_client.client.table.return_value.select.return_value.eq.return_value.execute.return_value = mock_response
+        ])
 
         supabase_client.load_point_cache("test-site")
 
@@ -153,6 +275,93 @@ class TestSupabaseClient:
         assert supabase_client.point_cache["point1"] == 1
         assert supabase_client.point_cache["point2"] == 2
 
+    def test_load_point_cache_reused_across_clients(self, supabase_client):
+        """Test a second client for the same site skips the points query"""
+        main._POINT_CACHE.clear()
+        mock_response = Mock()
+        mock_response.data = [{"id": 1, "name": "point1"}]
+
+        select = supabase_client.client.table.return_value.select
+        select.return_value.eq.return_value.execute.return_value = mock_response
+
+        supabase_client.load_point_cache("test-site")
+
+        with patch('main.create_client') as mock_create:
+            other = main.SupabaseClient(url="https://test.supabase.co", key="test-key")
+            other.load_point_cache("test-site")
+            mock_create.return_value.table.assert_not_called()
+
+        assert other.point_cache == {"point1": 1}
+        assert select.call_count == 1
+
+    def test_upsert_points_caches_inserted_ids(self, supabase_client):
+        """Test new point ids are read from the insert response"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 3, "name": "point3"}]
+
+        table = supabase_client.client.table.return_value
+        table.insert.return_value.execute.return_value = mock_response
+
+        supabase_client.upsert_points("test-site", ["point3"])
+
+        assert supabase_client.point_cache["point3"] == 3
+        table.select.assert_not_called()
+
+    def test_upsert_timeseries_copy_falls_back_to_rest(self, supabase_client):
+        """Test a failed COPY falls back to the REST upsert"""
+        samples = [{"point_id": 1, "ts": "2024-01-01T00:00:00+00:00", "value": 1.0}]
+
+        with patch.object(main.config, "supabase_db_url", "postgresql://test"), \
+                patch.object(supabase_client, "copy_timeseries", side_effect=Exception("down")):
+            inserted = supabase_client.upsert_timeseries(samples)
+
+        assert inserted == 1
+        upsert = supabase_client.client.table.return_value.upsert
+        upsert.assert_called_once()
+        assert upsert.call_args.kwargs["returning"] == main.ReturnMethod.minimal
+
+    def test_upsert_timeseries_halves_oversized_batch(self, supabase_client):
+        """Test a 413 response splits the page into smaller batches"""
+        samples = [
+            {"point_id": 1, "ts": f"2024-01-01T00:0{i}:00+00:00", "value": float(i)}
+            for i in range(4)
+        ]
+        upsert = supabase_client.client.table.return_value.upsert
+        upsert.return_value.execute.side_effect = [
+            Exception("413 Payload Too Large"), None, None
+        ]
+
+        inserted = supabase_client.upsert_timeseries(samples)
+
+        assert inserted == 4
+        assert [len(c.args[0]) for c in upsert.call_args_list] == [4, 2, 2]
+
+    def test_upsert_timeseries_restores_batch_size_after_split(self, supabase_client):
+        """Test batches return to full size once the oversized span is written"""
+        samples = [
+            {"point_id": 1, "ts": f"2024-01-01T00:{i:02d}:00+00:00", "value": float(i)}
+            for i in range(8)
+        ]
+        upsert = supabase_client.client.table.return_value.upsert
+        upsert.return_value.execute.side_effect = [
+            APIError({"message": "JSON could not be generated", "code": 413}), None, None, None
+        ]
+
+        with patch.object(main.config, "single_upsert_max_rows", 0), \
+                patch.object(main.config, "upsert_batch_size", 4):
+            inserted = supabase_client.upsert_timeseries(samples)
+
+        assert inserted == 8
+        assert [len(c.args[0]) for c in upsert.call_args_list] == [4, 2, 2, 4]
+
+    def test_is_payload_too_large_ignores_413_in_message_text(self):
+        """Test only the status/code (or the 413 reason phrase) counts as oversized"""
+        assert main.is_payload_too_large(APIError({"message": "x", "code": 413}))
+        assert main.is_payload_too_large(Exception("413 Payload Too Large"))
+        assert not main.is_payload_too_large(
+            Exception('duplicate key (point_id, ts)=(4132, 2024-01-01) violates "timeseries_pkey"')
+        )
+
 
 class TestDataProcessing:
     """Test data transformation and processing"""
@@ -174,7 +383,7 @@ class TestDataProcessing:
         assert len(transformed) == 1
         assert transformed[0]["point_id"] == 1
         assert transformed[0]["value"] == 123.45
-        assert "ts" in transformed[0]
+        assert transformed[0]["ts"] == "2024-01-01T00:00:00Z"
 
     def test_transform_samples_invalid(self):
         """Test handling invalid samples"""
@@ -190,6 +399,29 @@ class TestDataProcessing:
 
         assert len(transformed) == 0
 
+    def test_transform_samples_deduplicates(self):
+        """Test transform drops duplicate (point_id, ts) keeping the last value"""
+        raw_samples = [
+            {"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 100},
+            {"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 200},
+            {"name": "point1", "time": "2024-01-01T00:01:00Z", "value": 300},
+        ]
+
+        transformed = main.transform_samples(raw_samples, {"point1": 1})
+
+        assert [s["value"] for s in transformed] == [200.0, 300.0]
+
+    def test_transform_samples_alternate_keys(self):
+        """Test payloads keyed by point/timestamp are detected"""
+        raw_samples = [
+            {"point": "point1", "timestamp": "2024-01-01T00:00:00Z", "value": 1},
+            {"name": "point1", "time": "2024-01-01T00:01:00Z", "value": 2},
+        ]
+
+        transformed = main.transform_samples(raw_samples, {"point1": 1})
+
+        assert [s["value"] for s in transformed] == [1.0, 2.0]
+
     def test_deduplicate_samples(self):
         """Test sample deduplication"""
         samples = [
@@ -205,10 +437,99 @@ class TestDataProcessing:
         point1_sample = next(s for s in unique if s["point_id"] == 1)
         assert point1_sample["value"] == 200
 
+    def test_split_time_range(self):
+        """Test backfill ranges split into day windows with a short tail"""
+        start = datetime(2024, 1, 1)
+        windows = main.split_time_range(start, start + timedelta(days=2, hours=6), timedelta(days=1))
+
+        assert windows == [
+            (start, start + timedelta(days=1)),
+            (start + timedelta(days=1), start + timedelta(days=2)),
+            (start + timedelta(days=2), start + timedelta(days=2, hours=6)),
+        ]
+
+
+class TestSyncSite:
+    """Test the per-site sync loop"""
+
+    def test_sync_site_follows_cursor(self):
+        """Test pages are fetched in cursor order and totals accumulate"""
+        ace_client = Mock()
+        ace_client.fetch_timeseries_page.side_effect = [
+            ([{"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 1}], "page-2", None),
+            ([{"name": "point1", "time": "2024-01-01T00:01:00Z", "value": 2}], None, None),
+        ]
+
+        supabase_client = Mock()
+        supabase_client.point_cache = {"point1": 1}
+        supabase_client.upsert_timeseries.side_effect = lambda samples: len(samples)
+
+        result = main.sync_site(
+            ace_client, supabase_client, "test-site",
+            "2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"
+        )
+
+        cursors = [c.args[3] for c in ace_client.fetch_timeseries_page.call_args_list]
+        assert cursors == [None, "page-2"]
+        assert result["pages"] == 2
+        assert result["samples"] == 2
+        assert result["inserted"] == 2
+        assert "error" not in result
+
+    def test_sync_site_upserts_only_new_points(self):
+        """Test each page only creates points missing from the cache"""
+        ace_client = Mock()
+        ace_client.fetch_timeseries_page.side_effect = [
+            ([{"name": "point1", "time": "2024-01-01T00:00:00Z", "value": 1},
+              {"name": "point2", "time": "2024-01-01T00:00:00Z", "value": 2}], "page-2", None),
+            ([{"name": "point1", "time": "2024-01-01T00:01:00Z", "value": 3}], None, None),
+        ]
+
+        supabase_client = Mock()
+        supabase_client.point_cache = {"point1": 1}
+        supabase_client.upsert_timeseries.side_effect = lambda samples: len(samples)
+
+        result = main.sync_site(
+            ace_client, supabase_client, "test-site",
+            "2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"
+        )
+
+        supabase_client.upsert_points.assert_called_once_with("test-site", ["point2"])
+        assert result["unique_points"] == 2
+
+    def test_sync_site_isolated_closes_client(self):
+        """Test the per-site client's Postgres connection is released, even on error"""
+        shared_client = Mock()
+        with patch('main.sync_site', side_effect=Exception("boom")):
+            result = main.sync_site_isolated(
+                Mock(), shared_client, "test-site", "2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"
+            )
+
+        assert result["error"] == "boom"
+        shared_client.for_site.return_value.close.assert_called_once()
+        shared_client.close.assert_not_called()
+
+    @patch('main.create_client')
+    def test_for_site_shares_connection(self, mock_create):
+        """Test per-site views reuse the PostgREST client but not the point cache"""
+        shared_client = main.SupabaseClient("https://test.supabase.co", "test")
+        first = shared_client.for_site()
+        second = shared_client.for_site()
+
+        mock_create.assert_called_once()
+        assert first.client is shared_client.client
+        assert second.client is shared_client.client
+        assert first.point_cache is not second.point_cache
+
 
 class TestCloudFunctions:
     """Test Cloud Functions endpoints"""
 
+    @pytest.fixture(autouse=True)
+    def reset_clients(self):
+        """Drop cached clients so each test sees its own patched classes"""
+        main._ACE = main._SB = main._CLIENTS_STAMP = None
+
     @pytest.fixture
     def mock_request(self):
         """Create mock request fixture"""
@@ -231,6 +552,8 @@ class TestCloudFunctions:
         mock_supabase_instance = Mock()
         mock_supabase_instance.get_sites_from_db.return_value = ["test-site"]
         mock_supabase_instance.point_cache = {"point1": 1}
+        mock_supabase_instance.upsert_timeseries.return_value = 1
+        mock_supabase_instance.for_site.return_value = mock_supabase_instance
         mock_supabase.return_value = mock_supabase_instance
 
         mock_ace_instance = Mock()
@@ -248,6 +571,41 @@ class TestCloudFunctions:
         data = json.loads(response.data)
         assert data["success"] is True
 
+    def test_sync_site_isolated_error(self):
+        """Test a failing site is reported without raising"""
+        shared_client = Mock()
+        shared_client.for_site.return_value.load_point_cache.side_effect = Exception("boom")
+
+        result = main.sync_site_isolated(
+            Mock(), shared_client, "test-site", "2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"
+        )
+
+        assert result["site"] == "test-site"
+        assert result["inserted"] == 0
+        assert result["error"] == "boom"
+
+    @patch('main.load_config')
+    @patch('main.SupabaseClient')
+    @patch('main.sync_site_isolated')
+    def test_backfill_historical_windows(self, mock_sync, mock_supabase, mock_config, mock_request):
+        """Test backfill runs one sync per day window and sums the results"""
+        mock_sync.side_effect = lambda ace, supabase, site, start, end, max_pages: {
+            "site": site, "samples": 10, "inserted": 8, "unique_points": 2, "pages": 1
+        }
+        mock_request.get_json.return_value = {
+            "site": "test-site", "start_date": "2024-01-01", "end_date": "2024-01-04"
+        }
+
+        response, status_code = main.backfill_historical(mock_request)
+
+        assert status_code == 200
+        data = json.loads(response.data)
+        assert mock_sync.call_count == 3
+        assert data["samples"] == 30
+        assert data["inserted"] == 24
+        assert data["pages"] == 3
+        assert data["success"] is True
+
     @patch('main.load_config')
     def test_backfill_historical_missing_params(self, mock_config, mock_request):
         """Test backfill with missing parameters"""
@@ -266,6 +624,28 @@ class TestCloudFunctions:
         assert data["success"] is False
         assert "Missing required parameters" in data["error"]
 
+    @patch('main.load_config')
+    @patch('main.ACEAPIClient')
+    @patch('main.SupabaseClient')
+    def test_get_clients_reused(self, mock_supabase, mock_ace, mock_config):
+        """Test warm invocations reuse the same clients"""
+        first = main.get_clients()
+        second = main.get_clients()
+
+        assert first == second
+        assert mock_ace.call_count == 1
+        assert mock_supabase.call_count == 1
+
+    @patch('main.load_config')
+    def test_health_check_skips_config_when_loaded(self, mock_config, mock_request):
+        """Test warm health checks do not reload secrets"""
+        with patch.object(main.config, "ace_api_key", "test"):
+            response, status_code = main.health_check(mock_request)
+
+        assert status_code == 200
+        assert json.loads(response.data)["status"] == "healthy"
+        mock_config.assert_not_called()
+
 
 def test_http_session_creation():
     """Test HTTP session with retry logic"""
@@ -275,5 +655,13 @@ def test_http_session_creation():
     assert len(session.adapters) > 0
 
 
+def test_http_session_shared():
+    """Test ACE clients reuse one pooled session"""
+    first = main.ACEAPIClient(api_key="a", base_url="https://test.aceiot.cloud/api")
+    second = main.ACEAPIClient(api_key="b", base_url="https://test.aceiot.cloud/api")
+
+    assert first.session is second.session
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -6,10 +6,11 @@ This script ensures we attempt to fetch October data for EVERY configured point,
 not just accepting whatever the paginated endpoint returns.
 
 Strategy:
-1. Fetch all 7,327 configured point names from Supabase
-2. For each point, query ACE API for October data
-3. Use the non-paginated endpoint with explicit point filtering
-4. Report which points have data vs which don't
+1. Fetch all 7,327 configured point names from ACE
+2. Fetch the whole time window once from the paginated endpoint
+   (it has no per-point filter) and bucket samples by point name
+3. Report which points have data vs which don't
+4. Upsert the matched samples into Supabase
 
 Usage:
     python scripts/python/backfill_october_all_points.py \
@@ -19,115 +20,250 @@ Usage:
 """
 
 import argparse
+import logging
+import math
 import os
 import sys
 import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import FrozenSet, Iterator, List, Dict, Optional
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from supabase import create_client, Client
 
 ACE_BASE = os.environ.get("ACE_API_BASE", "https://flightdeck.aceiot.cloud/api")
+CONFIGURED_POINTS_WORKERS = 8
 
+# Per-page progress goes through logging so formatting is lazy and filterable
+log = logging.getLogger(__name__)
 
-def fetch_all_configured_points(site: str, ace_token: str, ace_base: str) -> List[str]:
-    """Fetch ALL configured point names from ACE API."""
-    points = []
-    page = 1
-    per_page = 1000
 
-    print(f"[1/5] Fetching ALL configured points from ACE API...")
+def create_session() -> requests.Session:
+    """HTTP session with connection pooling and retries on transient errors."""
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=16, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    while True:
-        url = f"{ace_base}/sites/{site}/configured_points?page={page}&per_page={per_page}"
-        headers = {"authorization": f"Bearer {ace_token}"}
 
-        try:
-            r = requests.get(url, headers=headers, timeout=60)
-            r.raise_for_status()
-            data = r.json()
+# Shared by every request so TLS connections are reused across pages
+SESSION = create_session()
 
-            items = data.get("items", [])
-            if not items:
-                break
+# Failures a page fetch may hit once retries are exhausted; anything else is a bug
+FETCH_ERRORS = (requests.exceptions.RequestException, orjson.JSONDecodeError)
 
-            for item in items:
-                name = item.get("name")
-                if name:
-                    points.append(name)
 
-            print(f"   Page {page}: {len(items)} points (total: {len(points)})")
+def fetch_configured_points_page(
+    site: str,
+    page: int,
+    per_page: int,
+    ace_token: str,
+    ace_base: str
+) -> List[Dict]:
+    """Fetch one page of configured points."""
+    url = f"{ace_base}/sites/{site}/configured_points?page={page}&per_page={per_page}"
+    headers = {"authorization": f"Bearer {ace_token}"}
+    r = SESSION.get(url, headers=headers, timeout=60)
+    r.raise_for_status()
+    return orjson.loads(r.content).get("items", [])
 
-            if len(items) < per_page:
-                break
 
-            page += 1
+def fetch_all_configured_points(site: str, ace_token: str, ace_base: str) -> FrozenSet[str]:
+    """Fetch ALL configured point names from ACE API as a set for O(1) lookups."""
+    points = set()
+    per_page = 1000
 
-        except Exception as e:
-            print(f"   Error on page {page}: {e}", file=sys.stderr)
-            break
+    print(f"[1/5] Fetching ALL configured points from ACE API...")
+
+    def add_page(page: int, items: List[Dict]) -> bool:
+        """Record a page; returns True when it was the last one."""
+        for item in items:
+            name = item.get("name")
+            if name:
+                points.add(name)
+        if items:
+            log.info("   Page %d: %d points (total: %d)", page, len(items), len(points))
+        return len(items) < per_page
+
+    # The first page tells us whether there is anything to parallelize
+    try:
+        done = add_page(1, fetch_configured_points_page(site, 1, per_page, ace_token, ace_base))
+    except FETCH_ERRORS as e:
+        log.error("   Error on page 1: %s", e)
+        done = True
+
+    # Pages are independent, so fetch them in batches and stop at the first short page
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=CONFIGURED_POINTS_WORKERS) as executor:
+        while not done:
+            pages = range(next_page, next_page + CONFIGURED_POINTS_WORKERS)
+            futures = [
+                executor.submit(fetch_configured_points_page, site, page, per_page, ace_token, ace_base)
+                for page in pages
+            ]
+            for page, future in zip(pages, futures):
+                try:
+                    done = add_page(page, future.result())
+                except FETCH_ERRORS as e:
+                    log.error("   Error on page %d: %s", page, e)
+                    done = True
+                if done:
+                    break
+            next_page += CONFIGURED_POINTS_WORKERS
 
     print(f"   ✓ Total configured points: {len(points)}")
     print()
-    return points
+    return frozenset(points)
 
 
-def fetch_point_data(
-    site: str,
-    point_name: str,
-    start_iso: str,
-    end_iso: str,
-    ace_token: str,
-    ace_base: str
-) -> List[Dict]:
+class PointColumns:
     """
-    Fetch October data for a specific point using individual point query.
+    Samples for one point stored column-wise.
 
-    Tries multiple API strategies:
-    1. Paginated endpoint with point filter (if supported)
-    2. Individual point timeseries endpoint
-    3. Batch query with single point
+    Timestamps stay as the ACE strings; values are parsed once into a packed
+    array of doubles, so no per-sample dict outlives its page.
     """
-    headers = {
-        "authorization": f"Bearer {ace_token}",
-        "accept": "application/json"
-    }
+    __slots__ = ("times", "values")
 
-    samples = []
+    def __init__(self):
+        self.times: List[str] = []
+        self.values = array("d")
 
-    # Strategy 1: Try paginated endpoint (even though it may not support point filtering)
-    try:
-        url = f"{ace_base}/sites/{site}/timeseries/paginated"
-        params = {
-            "start_time": start_iso,
-            "end_time": end_iso,
-            "raw_data": "true",
-            "page_size": "50000"
-        }
+    def __len__(self) -> int:
+        return len(self.times)
 
-        r = requests.get(url, headers=headers, params=params, timeout=120)
-        r.raise_for_status()
-        data = r.json()
-
-        # Filter for this specific point
-        point_samples = data.get("point_samples", [])
-        for sample in point_samples:
-            sample_name = sample.get("name") or sample.get("point") or sample.get("point_name")
-            if sample_name == point_name:
-                ts = sample.get("time") or sample.get("timestamp")
-                value = sample.get("value")
-                if ts is not None and value is not None:
-                    samples.append({
-                        "point_name": point_name,
-                        "timestamp": ts,
-                        "value": value
-                    })
 
+def build_point_index(
+    all_samples: List[Dict],
+    point_names=None,
+    index: Optional[Dict[str, PointColumns]] = None
+) -> Dict[str, PointColumns]:
+    """
+    Bucket samples by point name in a single pass.
+
+    If point_names is given, samples for any other point are dropped.
+    Pass an existing index to add another page of samples to it; it may be
+    pre-sized with dict.fromkeys(names), and None entries get a bucket on
+    their first sample. Samples without a timestamp or numeric value are
+    skipped.
+    """
+    if index is None:
+        index = {}
+
+    # Samples arrive grouped by point, so the bucket's appends are reused
+    # until the name changes
+    get = dict.get
+    isfinite = math.isfinite
+    last_name = None
+    append_time = append_value = None
+
+    for sample in all_samples:
+        name = get(sample, "name") or get(sample, "point") or get(sample, "point_name")
+        if not name:
+            # Also keeps a leading nameless sample from matching the initial last_name
+            continue
+        if name != last_name:
+            bucket = get(index, name)
+            if bucket is None:
+                if point_names is not None and name not in point_names:
+                    continue
+                bucket = index[name] = PointColumns()
+            append_time = bucket.times.append
+            append_value = bucket.values.append
+            last_name = name
+
+        ts = get(sample, "time") or get(sample, "timestamp")
+        if ts is None:
+            continue
+        try:
+            value = float(get(sample, "value"))
+        except (TypeError, ValueError):
+            continue
+        if not isfinite(value):
+            continue
+        append_value(value)
+        append_time(ts)
+
+    return index
+
+
+def load_point_ids(client: Client, site: str) -> Dict[str, int]:
+    """Load name -> id for every point of the site (paged past PostgREST's row cap)."""
+    name_to_id: Dict[str, int] = {}
+    offset = 0
+    page_size = 1000
+
+    while True:
+        res = (
+            client.table("points")
+            .select("id,name")
+            .eq("site_name", site)
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        for row in res.data:
+            name_to_id[row["name"]] = int(row["id"])
+        if len(res.data) < page_size:
+            break
+        offset += page_size
+
+    return name_to_id
+
+
+def iter_timeseries_rows(
+    point_data_map: Dict[str, PointColumns],
+    point_ids: Dict[str, int]
+) -> Iterator[Dict]:
+    """Yield timeseries rows, one per (point_id, ts) with the last sample winning."""
+    for name, columns in point_data_map.items():
+        point_id = point_ids.get(name)
+        if point_id is None:
+            continue  # Skip points not in database
+
+        by_ts = dict(zip(columns.times, columns.values))
+        for ts, value in by_ts.items():
+            yield {"point_id": point_id, "ts": ts, "value": value}
+
+
+def upsert_point_data(
+    client: Client,
+    site: str,
+    point_data_map: Dict[str, PointColumns],
+    batch_size: int = 1000
+) -> int:
+    """Upsert bucketed samples into the timeseries table in fixed-size chunks."""
+    try:
+        point_ids = load_point_ids(client, site)
     except Exception as e:
-        # If paginated fails, try other strategies
-        pass
+        print(f"   Error fetching point IDs: {e}", file=sys.stderr)
+        return 0
+
+    rows = iter_timeseries_rows(point_data_map, point_ids)
+    inserted = 0
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        try:
+            client.table("timeseries").upsert(
+                chunk,
+                on_conflict="point_id,ts"
+            ).execute()
+            inserted += len(chunk)
+        except Exception as e:
+            print(f"   Error upserting chunk: {e}", file=sys.stderr)
 
-    return samples
+    return inserted
 
 
 def backfill_all_points_october(
@@ -158,7 +294,10 @@ def backfill_all_points_october(
     print(f"   This may take several minutes...")
     print()
 
-    all_samples = []
+    # Each page is bucketed as it arrives, so only matched samples are kept.
+    # The map is pre-sized with every configured point to avoid rehashing.
+    point_data_map: Dict[str, Optional[PointColumns]] = dict.fromkeys(all_points)
+    total_samples = 0
     cursor = None
     page = 0
 
@@ -179,17 +318,21 @@ def backfill_all_points_october(
         }
 
         try:
-            r = requests.get(url, headers=headers, params=params, timeout=180)
+            r = SESSION.get(url, headers=headers, params=params, timeout=180)
             r.raise_for_status()
-            data = r.json()
+            data = orjson.loads(r.content)
 
             samples = data.get("point_samples", [])
-            all_samples.extend(samples)
+            cursor = data.get("next_cursor")
+            total_samples += len(samples)
+            build_point_index(samples, all_points, point_data_map)
 
             page += 1
-            print(f"   Page {page}: {len(samples)} samples (total: {len(all_samples)})")
+            log.info("   Page %d: %d samples (total: %d)", page, len(samples), total_samples)
+
+            # Drop the raw page before fetching the next one
+            del data, samples
 
-            cursor = data.get("next_cursor")
             if not cursor:
                 break
 
@@ -197,23 +340,18 @@ def backfill_all_points_october(
                 print(f"   WARNING: Stopped at page {page} (safety limit)")
                 break
 
-        except Exception as e:
-            print(f"   Error on page {page}: {e}", file=sys.stderr)
+        except FETCH_ERRORS as e:
+            log.error("   Error on page %d: %s", page, e)
             break
 
-    print(f"   ✓ Fetched {len(all_samples)} total samples from ACE API")
+    print(f"   ✓ Fetched {total_samples} total samples from ACE API")
     print()
 
+    # Drop points with no (valid) samples; an empty PointColumns is falsy
+    point_data_map = {name: columns for name, columns in point_data_map.items() if columns}
+
     # Match samples to configured points
     print(f"[4/5] Matching samples to configured points...")
-    point_data_map = {}
-
-    for sample in all_samples:
-        point_name = sample.get("name") or sample.get("point") or sample.get("point_name")
-        if point_name in all_points:
-            if point_name not in point_data_map:
-                point_data_map[point_name] = []
-            point_data_map[point_name].append(sample)
 
     points_with_data = len(point_data_map)
     points_without_data = len(all_points) - points_with_data
@@ -225,7 +363,7 @@ def backfill_all_points_october(
     # Report points without data
     if points_without_data > 0:
         print(f"   Points without October data (showing first 20):")
-        no_data_points = [p for p in all_points if p not in point_data_map]
+        no_data_points = sorted(all_points - point_data_map.keys())
         for i, pname in enumerate(no_data_points[:20], 1):
             print(f"     {i}. {pname}")
         if len(no_data_points) > 20:
@@ -233,11 +371,11 @@ def backfill_all_points_october(
     print()
 
     # Insert into Supabase
-    print(f"[5/5] Inserting {len(all_samples)} samples into Supabase...")
+    matched_samples = sum(len(columns) for columns in point_data_map.values())
+    print(f"[5/5] Inserting {matched_samples} samples into Supabase...")
 
-    # TODO: Implement Supabase insertion
-    # For now, just report what would be inserted
-    print(f"   ✓ Would insert {len(all_samples)} samples for {points_with_data} points")
+    inserted = upsert_point_data(supabase_client, site, point_data_map)
+    print(f"   ✓ Inserted {inserted} samples for {points_with_data} points")
     print()
 
     print("=" * 80)
@@ -252,6 +390,9 @@ def backfill_all_points_october(
 
 
 def main():
+    # Same stream and bare format as the print() report so output stays in order
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
     parser = argparse.ArgumentParser(description="Backfill October data for ALL configured points")
     parser.add_argument("--site", required=True, help="Site name (e.g., ses_falls_city)")
     parser.add_argument("--start", required=True, help="Start time (ISO8601)")
@@ -9,6 +9,8 @@ Backfill RAW samples from ACE paginated endpoint into Supabase (points, timeseri
 Usage (env or CLI):
 - Env:
   SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, ACE_API_KEY
+  DATABASE_URL / SUPABASE_DB_URL / SUPABASE_PG_URL (optional): direct Postgres URL;
+    timeseries are loaded with COPY
 - CLI:
   --site SITE --start 2025-10-01T00:00:00Z --end 2025-10-27T00:00:00Z --chunk-minutes 10 --page-size 10000 --max-chunks 120
 
@@ -26,22 +28,81 @@ from __future__ import annotations
 import argparse
 import os
 import sys
+import threading
 import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
+from itertools import islice
 from typing import Dict, List, Tuple, Optional
 
 import requests
 import math
-import json
+import orjson
 import random
 import shlex
 import subprocess
+import urllib3
 from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 from urllib3.util.retry import Retry
 from supabase import create_client, Client
 import math
 
 ACE_BASE_DEFAULT = os.environ.get("ACE_API_BASE", "https://flightdeck.aceiot.cloud/api")
+# Windows fetched from ACE concurrently; upserts stay on the calling thread
+ACE_WINDOW_WORKERS = int(os.environ.get("ACE_WINDOW_WORKERS", "4"))
+# Point-name subsets of a window fetched concurrently (shared by all windows)
+ACE_SUBSET_WORKERS = int(os.environ.get("ACE_SUBSET_WORKERS", "8"))
+# Coalesced batches written to Supabase concurrently with ACE fetches
+SUPABASE_WRITE_WORKERS = int(os.environ.get("SUPABASE_WRITE_WORKERS", "4"))
+# Samples buffered across windows before one upsert_timeseries call
+COALESCE_ROWS = int(os.environ.get("BACKFILL_COALESCE_ROWS", "50000"))
+# Optional directory for a per-site name -> id snapshot reused across runs
+POINT_CACHE_DIR = os.environ.get("BACKFILL_POINT_CACHE_DIR")
+# Saved point maps older than this are ignored and reloaded from Supabase
+POINT_CACHE_TTL_SECONDS = int(os.environ.get("BACKFILL_POINT_CACHE_TTL_SECONDS", str(24 * 3600)))
+# After this many empty windows in a row, double the window size (up to the cap)
+EMPTY_WINDOWS_BEFORE_WIDEN = 3
+MAX_WIDENED_WINDOW = timedelta(minutes=60)
+# Optional direct Postgres connection string; enables COPY instead of PostgREST
+DATABASE_URL = (
+    os.environ.get("DATABASE_URL")
+    or os.environ.get("SUPABASE_DB_URL")
+    or os.environ.get("SUPABASE_PG_URL")
+)
+# One COPY connection per writer thread
+_PG_LOCAL = threading.local()
+# Split PostgREST request bodies above this size
+MAX_BODY_BYTES = 900_000
+# Serializes point creation so concurrent writers don't insert the same names
+_POINTS_LOCK = threading.Lock()
+
+
+_RETRY = Retry(total=5, connect=3, read=3, backoff_factor=0.5,
+               status_forcelist=(429, 500, 502, 503, 504, 520, 521, 522, 523),
+               allowed_methods=frozenset(["GET"]),
+               respect_retry_after_header=True)
+_ADAPTER = HTTPAdapter(max_retries=_RETRY, pool_maxsize=16)
+
+
+def _build_session() -> requests.Session:
+    """Session with retry/backoff, shared across windows so keep-alive survives."""
+    session = requests.Session()
+    session.mount("https://", _ADAPTER)
+    session.mount("http://", _ADAPTER)
+    session.headers.update({
+        "accept": "application/json",
+        # gzip/deflate always; br too when brotli is installed. Bodies are read with
+        # resp.raw.read(decode_content=True), which decodes them.
+        "accept-encoding": ACCEPT_ENCODING,
+        "connection": "keep-alive",
+        "user-agent": "bv-backfill/1.0"
+    })
+    return session
+
+
+_SESSION = _build_session()
 
 def _ace_supports_point_names(ace_base: str) -> bool:
     """Return True if the ACE base is known to support point_names filtering.
@@ -65,6 +126,11 @@ def iso(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+def ms_to_iso(ms: int) -> str:
+    """Epoch ms -> whole-second UTC ISO string; same output as iso() without building a datetime."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ms // 1000))
+
+
 def chunk(lst, size):
     for i in range(0, len(lst), size):
         yield lst[i : i + size]
@@ -75,10 +141,10 @@ def get_site_earliest_ts(supabase_url: str, supabase_key: str, site: str) -> int
     url = f"{base}/rest/v1/timeseries?select=ts,points!inner(site_name)&points.site_name=eq.{site}&order=ts.asc&limit=1"
     headers = {"apikey": supabase_key, "Authorization": f"Bearer {supabase_key}", "accept": "application/json"}
     try:
-        r = requests.get(url, headers=headers, timeout=30)
+        r = _SESSION.get(url, headers=headers, timeout=30)
         if not r.ok:
             return None
-        data = r.json() if r.content else []
+        data = orjson.loads(r.content) if r.content else []
         if not data:
             return None
         ts_iso = data[0].get("ts")
@@ -98,27 +164,15 @@ def fetch_paginated_window(
     timeout_sec: int = 180,
     ace_base: str = ACE_BASE_DEFAULT,
     point_names: Optional[List[str]] = None,
-) -> List[Dict]:
+    session: Optional[requests.Session] = None,
+) -> "SampleBatch":
     """Fetch RAW samples for a site/time window using ACE paginated endpoint (raw_data=true)."""
-    out: List[Dict] = []
+    out = SampleBatch()
     cursor = None
     started = time.time()
     pages = 0
-    session = requests.Session()
-    retry = Retry(total=5, connect=3, read=3, backoff_factor=0.5,
-                  status_forcelist=(429, 500, 502, 503, 504, 520, 521, 522, 523),
-                  allowed_methods=frozenset(["GET"]),
-                  respect_retry_after_header=True)
-    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=4)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    session.headers.update({
-        "authorization": f"Bearer {ace_token}",
-        "accept": "application/json",
-        "accept-encoding": "identity",
-        "connection": "keep-alive",
-        "user-agent": "bv-backfill/1.0"
-    })
+    session = session or _SESSION
+    headers = {"authorization": f"Bearer {ace_token}"}
 
     # Cap page size conservatively to reduce chunked transfer failures
     effective_page_size = max(10000, min(int(page_size), 50000))
@@ -150,20 +204,25 @@ def fetch_paginated_window(
         data = {}
         for attempt in range(4):
             try:
-                resp = session.get(url, params=params, timeout=request_timeout, stream=True)
-                if not resp.ok:
-                    raise RuntimeError(f"ACE {resp.status_code}: {resp.text[:200]}")
-                buf = bytearray()
-                for chunk in resp.iter_content(chunk_size=65536):
-                    if chunk:
-                        buf.extend(chunk)
-                text = buf.decode(resp.encoding or 'utf-8', errors='replace')
-                data = json.loads(text) if text else {}
+                resp = session.get(url, params=params, headers=headers, timeout=request_timeout, stream=True)
+                try:
+                    if not resp.ok:
+                        raise RuntimeError(f"ACE {resp.status_code}: {resp.text[:200]}")
+                    # One urllib3 read (gzip/br decoded) instead of requests' 10 KiB iter_content join
+                    body = resp.raw.read(decode_content=True)
+                finally:
+                    resp.close()
+                # orjson parses the bytes directly - no intermediate str
+                data = orjson.loads(body) if body else {}
+                # Free the raw page now rather than while its rows are processed
+                del body
                 break
             except (requests.exceptions.ChunkedEncodingError,
                     requests.exceptions.ContentDecodingError,
                     requests.exceptions.RequestException,
-                    json.JSONDecodeError) as e:
+                    # resp.raw.read() raises urllib3's own errors (truncation, decode, read timeout)
+                    urllib3.exceptions.HTTPError,
+                    orjson.JSONDecodeError) as e:
                 last_err = e
                 if effective_page_size > 10000:
                     effective_page_size = max(10000, int(effective_page_size * 0.6))
@@ -173,11 +232,13 @@ def fetch_paginated_window(
         else:
             raise last_err
         rows = data.get("point_samples") or []
+        next_cursor = data.get("next_cursor") or None
+        data = None
 
         # Track empty pages to avoid infinite loops on bad cursors
         if not rows:
             # Empty page - check if this is the end or a cursor issue
-            cursor = data.get("next_cursor") or None
+            cursor = next_cursor
             if not cursor:
                 break  # No more data
             # If cursor exists but no data, try one more time then stop
@@ -186,28 +247,11 @@ def fetch_paginated_window(
                 break
             continue  # Try next cursor
 
-        for r in rows:
-            name = r.get("name") or r.get("point") or r.get("point_name")
-            t = r.get("time") or r.get("timestamp") or r.get("ts")
-            try:
-                ts = int(t) if isinstance(t, int) else int(datetime.fromisoformat(str(t).replace("Z","+00:00")).timestamp() * 1000)
-            except Exception:
-                continue
-            try:
-                val_raw = r.get("value")
-                # Reject explicit string NaN/Inf first
-                if isinstance(val_raw, str) and val_raw.strip().lower() in ("nan", "+inf", "-inf", "inf", "infinity"):
-                    continue
-                val = float(val_raw)
-                if not math.isfinite(val):
-                    continue
-            except Exception:
-                continue
-            if not name:
-                continue
-            out.append({"point_name": name, "timestamp": ts, "value": val})
+        clean_page(rows, out)
 
-        cursor = data.get("next_cursor") or None
+        # Drop the parsed page before the next request
+        rows = None
+        cursor = next_cursor
         pages += 1
         if not cursor or pages > 200:
             break
@@ -215,20 +259,106 @@ def fetch_paginated_window(
     return out
 
 
-def get_point_names_from_supabase(client: Client, site: str, limit: int = 100000) -> List[str]:
-    names: List[str] = []
-    try:
-        # Fetch up to limit names from points table for this site
-        res = client.table("points").select("name").eq("site_name", site).execute()
-        for r in (res.data or []):
-            n = str(r.get("name") or "").strip()
-            if n:
-                names.append(n)
-    except Exception:
-        return []
-    # De-duplicate, capped by limit
-    out = list(dict.fromkeys(names))
-    return out[:limit]
+class SampleBatch:
+    """RAW samples as parallel columns: point name, epoch ms and value.
+
+    Replaces one {point_name, timestamp, value} dict per sample; ts/vals are
+    typed arrays, so a window costs three containers instead of N dicts.
+    """
+
+    __slots__ = ("names", "ts", "vals")
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.ts = array("q")
+        self.vals = array("d")
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def append(self, name: str, ts: int, val: float) -> None:
+        # ts first: it is the only column that can reject a value (out of int64 range)
+        self.ts.append(ts)
+        self.vals.append(val)
+        self.names.append(name)
+
+    def extend(self, other: "SampleBatch") -> None:
+        self.names.extend(other.names)
+        self.ts.extend(other.ts)
+        self.vals.extend(other.vals)
+
+    def clear(self) -> None:
+        self.names.clear()
+        del self.ts[:]
+        del self.vals[:]
+
+
+NAME_KEYS = ("name", "point", "point_name")
+TIME_KEYS = ("time", "timestamp", "ts")
+
+
+def detect_sample_key(sample: Dict, candidates: Tuple[str, ...]) -> str:
+    """Pick the first candidate key present on a sample."""
+    for key in candidates:
+        if sample.get(key):
+            return key
+    return candidates[0]
+
+
+def clean_page(rows: List[Dict], out: SampleBatch) -> None:
+    """Append valid (point name, epoch ms, value) samples from one ACE page to out.
+
+    Field names are detected once per page. Native int/float values and int
+    timestamps skip the try/except conversion; ISO timestamps are parsed once
+    per distinct string since every point polled at the same instant repeats
+    it. String NaN/Inf parse to non-finite floats and are dropped.
+    """
+    if not rows:
+        return
+    name_key = detect_sample_key(rows[0], NAME_KEYS)
+    time_key = detect_sample_key(rows[0], TIME_KEYS)
+    isfinite = math.isfinite
+    append_name, append_ts, append_val = out.names.append, out.ts.append, out.vals.append
+    parsed_times: Dict[str, int] = {}
+    for r in rows:
+        name = r.get(name_key)
+        if not name:
+            continue
+        t = r.get(time_key)
+        if type(t) is int:
+            ts = t
+        elif type(t) is str:
+            ts = parsed_times.get(t)
+            if ts is None:
+                try:
+                    ts = int(datetime.fromisoformat(t.replace("Z", "+00:00")).timestamp() * 1000)
+                except ValueError:
+                    continue
+                parsed_times[t] = ts
+        else:
+            continue
+        val = r.get("value")
+        val_type = type(val)
+        if val_type is float:
+            if not isfinite(val):
+                continue
+        elif val_type is int:
+            # orjson caps ints at 64 bits, so the float is always finite
+            val = float(val)
+        else:
+            try:
+                val = float(val)
+            except (TypeError, ValueError):
+                continue
+            if not isfinite(val):
+                continue
+        # ts first, so a timestamp outside int64 can't leave the columns misaligned
+        try:
+            append_ts(ts)
+        except OverflowError:
+            continue
+        append_val(val)
+        append_name(name)
 
 
 def fetch_window_via_cli(
@@ -239,9 +369,9 @@ def fetch_window_via_cli(
     page_size: int,
     point_names: Optional[List[str]] = None,
     timeout_sec: int = 120,
-) -> List[Dict]:
-    """Use aceiot-models-cli to fetch a window; returns list of {point_name,timestamp,value}.
-    Falls back to empty list on error; caller may retry with smaller params.
+) -> SampleBatch:
+    """Use aceiot-models-cli to fetch a window; returns a SampleBatch.
+    Falls back to an empty batch on error; caller may retry with smaller params.
     """
     base_cmd = os.environ.get("ACE_CLI_CMD", "aceiot-models")
     args = [
@@ -263,77 +393,107 @@ def fetch_window_via_cli(
     if os.environ.get("ACE_API_BASE"):
         env["ACE_API_BASE"] = os.environ.get("ACE_API_BASE")
     try:
-        p = subprocess.run(args, capture_output=True, text=True, timeout=timeout_sec, env=env)
+        # Keep stdout as bytes; orjson parses them without a decode pass
+        p = subprocess.run(args, capture_output=True, timeout=timeout_sec, env=env)
         if p.returncode != 0:
-            return []
+            return SampleBatch()
         text = p.stdout.strip()
-        data: List[Dict] = []
+        data = SampleBatch()
         try:
-            obj = json.loads(text)
+            obj = orjson.loads(text)
             # Accept either {point_samples:[..]} or list
             rows = obj.get("point_samples") if isinstance(obj, dict) else obj
             if isinstance(rows, list):
-                for s in rows:
-                    n = s.get("name") or s.get("point") or s.get("point_name")
-                    t = s.get("time") or s.get("timestamp") or s.get("ts")
-                    v = s.get("value")
-                    try:
-                        ts = int(t) if isinstance(t, int) else int(datetime.fromisoformat(str(t).replace("Z","+00:00")).timestamp() * 1000)
-                    except Exception:
-                        continue
-                    try:
-                        val = float(v)
-                    except Exception:
-                        continue
-                    if n and math.isfinite(val):
-                        data.append({"point_name": n, "timestamp": ts, "value": val})
-        except json.JSONDecodeError:
+                clean_page(rows, data)
+        except orjson.JSONDecodeError:
             # Try NDJSON fallback
+            rows = []
             for line in text.splitlines():
                 line = line.strip()
                 if not line:
                     continue
                 try:
-                    s = json.loads(line)
-                    n = s.get("name") or s.get("point") or s.get("point_name")
-                    t = s.get("time") or s.get("timestamp") or s.get("ts")
-                    v = s.get("value")
-                    ts = int(t) if isinstance(t, int) else int(datetime.fromisoformat(str(t).replace("Z","+00:00")).timestamp() * 1000)
-                    val = float(v)
-                    if n and math.isfinite(val):
-                        data.append({"point_name": n, "timestamp": ts, "value": val})
-                except Exception:
+                    rows.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
                     continue
+            clean_page(rows, data)
         return data
     except Exception:
-        return []
+        return SampleBatch()
 
 
 def load_all_point_ids(client: Client, site: str) -> Dict[str, int]:
-    """Pre-load ALL existing point IDs for the site to avoid repeated upserts"""
-    name_to_id: Dict[str, int] = {}
-    offset = 0
+    """Pre-load ALL existing point IDs for the site to avoid repeated upserts.
+
+    The first page also returns the exact row count, so the remaining pages
+    are fetched concurrently instead of one offset at a time. If no count
+    comes back, pages are read one at a time until a short page.
+    """
     batch_size = 1000
 
-    while True:
-        res = (
+    def fetch_page(offset: int, count: Optional[str] = None):
+        return (
             client.table("points")
-            .select("id,name")
+            .select("id,name", count=count)
             .eq("site_name", site)
+            .order("id")
             .range(offset, offset + batch_size - 1)
             .execute()
         )
-        if not res.data:
-            break
-        for r in res.data:
-            name_to_id[r["name"]] = int(r["id"])
-        if len(res.data) < batch_size:
-            break
-        offset += batch_size
 
+    first = fetch_page(0, count="exact")
+    pages = [first.data or []]
+    if first.count is None:
+        # No count came back; page sequentially until a short page
+        offset = batch_size
+        while len(pages[-1]) == batch_size:
+            pages.append(fetch_page(offset).data or [])
+            offset += batch_size
+    else:
+        offsets = range(batch_size, first.count, batch_size)
+        if offsets:
+            with ThreadPoolExecutor(max_workers=min(8, len(offsets))) as pool:
+                pages.extend(res.data or [] for res in pool.map(fetch_page, offsets))
+
+    name_to_id: Dict[str, int] = {}
+    for rows in pages:
+        for r in rows:
+            name_to_id[r["name"]] = int(r["id"])
     return name_to_id
 
 
+def _point_cache_file(site: str) -> Optional[str]:
+    if not POINT_CACHE_DIR:
+        return None
+    return os.path.join(POINT_CACHE_DIR, f"points_{site}.json")
+
+
+def read_point_cache_file(site: str) -> Dict[str, int]:
+    """Return the saved name -> id map for site, or {} when disabled/missing/stale/corrupt."""
+    path = _point_cache_file(site)
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        if time.time() - os.path.getmtime(path) > POINT_CACHE_TTL_SECONDS:
+            return {}
+        with open(path, "rb") as f:
+            return {str(k): int(v) for k, v in orjson.loads(f.read()).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def write_point_cache_file(site: str, point_cache: Dict[str, int]) -> None:
+    path = _point_cache_file(site)
+    if not path:
+        return
+    try:
+        os.makedirs(POINT_CACHE_DIR, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(point_cache))
+    except OSError as e:
+        print(f"[PointCache] failed to save {path}: {e}", file=sys.stderr)
+
+
 def upsert_points(client: Client, site: str, names: List[str], point_cache: Dict[str, int]) -> Dict[str, int]:
     """Insert only NEW points, use cache for existing ones. Avoids expensive upserts."""
     names = sorted(set([n for n in names if n]))
@@ -343,87 +503,173 @@ def upsert_points(client: Client, site: str, names: List[str], point_cache: Dict
     # Identify which points are new (not in cache)
     new_names = [n for n in names if n not in point_cache]
 
-    if new_names:
-        # Insert new points in small batches
-        rows = [{"site_name": site, "name": n} for n in new_names]
-        for batch_rows in chunk(rows, 50):
+    for batch in chunk(new_names, 500):
+        # Another run (or a stale snapshot) may already have created some of
+        # these: cheap SELECTs first, so only the true remainder is written.
+        # 100 names per lookup keeps the in.(...) query string under gateway URL limits.
+        for lookup in chunk(batch, 100):
             try:
-                # Use insert instead of upsert - faster and won't timeout
-                # If duplicate, the DB will reject it and we'll fetch the ID
-                client.table("points").insert(batch_rows).execute()
-            except Exception:
-                # Conflict means point already exists, will fetch ID below
-                pass
-
-        # Fetch IDs for the new points we just inserted
-        for batch in chunk(new_names, 100):
-            res = (
-                client.table("points")
-                .select("id,name")
-                .eq("site_name", site)
-                .in_("name", batch)
-                .execute()
-            )
-            for r in res.data or []:
+                found = (
+                    client.table("points")
+                    .select("id,name")
+                    .eq("site_name", site)
+                    .in_("name", lookup)
+                    .execute()
+                )
+            except Exception as e:
+                # Treat as not found; the insert/upsert below still resolves the ids
+                print(f"[Points] lookup of {len(lookup)} names failed: {e}", file=sys.stderr)
+                continue
+            for r in found.data or []:
                 point_cache[r["name"]] = int(r["id"])
+        rows = [{"site_name": site, "name": n} for n in batch if n not in point_cache]
+        if not rows:
+            continue
+        # The inserted rows (with ids) come back in the response
+        try:
+            # Use insert instead of upsert - faster and won't timeout
+            res = client.table("points").insert(rows).execute()
+        except Exception:
+            # Lost a race with a concurrent run: upsert so existing rows are returned too
+            try:
+                res = client.table("points").upsert(rows, on_conflict="site_name,name").execute()
+            except Exception as e:
+                # Samples for these names are skipped by upsert_timeseries
+                print(f"[Points] failed to create {len(rows)} points: {e}", file=sys.stderr)
+                continue
+        for r in res.data or []:
+            point_cache[r["name"]] = int(r["id"])
 
     # Return IDs for requested names (from cache)
     return {n: point_cache[n] for n in names if n in point_cache}
 
 
-def upsert_timeseries(client: Client, site: str, samples: List[Dict], point_cache: Dict[str, int]) -> int:
+def _get_pg_connection():
+    """Open (or reuse) this thread's direct Postgres connection used for COPY."""
+    conn = getattr(_PG_LOCAL, "conn", None)
+    if conn is None or conn.closed:
+        import psycopg
+        conn = _PG_LOCAL.conn = psycopg.connect(DATABASE_URL)
+    return conn
+
+
+def _close_pg_connection() -> None:
+    conn = getattr(_PG_LOCAL, "conn", None)
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        _PG_LOCAL.conn = None
+
+
+def copy_timeseries(rows: List[Tuple[Tuple[int, str], float]]) -> int:
+    """COPY deduplicated ((point_id, ts), value) rows into a temp table, then merge with one INSERT ... ON CONFLICT."""
+    conn = _get_pg_connection()
+    with conn.transaction():
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE ts_stage "
+                "(point_id bigint, ts timestamptz, value double precision) "
+                "ON COMMIT DROP"
+            )
+            with cur.copy("COPY ts_stage (point_id, ts, value) FROM STDIN") as copy:
+                for (pid, ts), val in rows:
+                    copy.write_row((pid, ts, val))
+            cur.execute(
+                "INSERT INTO timeseries (point_id, ts, value) "
+                "SELECT point_id, ts, value FROM ts_stage "
+                "ON CONFLICT (point_id, ts) DO UPDATE SET value = EXCLUDED.value"
+            )
+    return len(rows)
+
+
+def write_timeseries_batch(client: Client, rows: List[Dict], upsert: bool = False) -> None:
+    """POST one timeseries batch to PostgREST with an orjson-encoded body.
+
+    Equivalent to client.table("timeseries").insert/upsert(...).execute(), minus
+    the stdlib json encoding of thousands of row dicts per call.
+    """
+    body = orjson.dumps(rows)
+    if len(body) > MAX_BODY_BYTES and len(rows) > 1:
+        # Keep each request under PostgREST's comfortable payload size
+        mid = len(rows) // 2
+        write_timeseries_batch(client, rows[:mid], upsert)
+        write_timeseries_batch(client, rows[mid:], upsert)
+        return
+    key = client.supabase_key
+    headers = {
+        "apikey": key,
+        "authorization": f"Bearer {key}",
+        "content-type": "application/json",
+        "prefer": "resolution=merge-duplicates,return=minimal" if upsert else "return=minimal",
+    }
+    params = {"on_conflict": "point_id,ts"} if upsert else None
+    url = f"{str(client.supabase_url).rstrip('/')}/rest/v1/timeseries"
+    resp = _SESSION.post(url, params=params, data=body, headers=headers, timeout=60)
+    resp.raise_for_status()
+
+
+def upsert_timeseries(client: Client, site: str, samples: SampleBatch, point_cache: Dict[str, int]) -> int:
     """Insert timeseries data using pre-loaded point cache. Uses INSERT for speed."""
     if not samples:
         return 0
 
-    # Map names to ids using cache
-    names = list({s["point_name"] for s in samples if s.get("point_name")})
-    map_ids = upsert_points(client, site, names, point_cache)
+    # Only names missing from the run-wide cache cost a Supabase round-trip
+    missing = set(samples.names).difference(point_cache)
+    if missing:
+        with _POINTS_LOCK:
+            upsert_points(client, site, list(missing), point_cache)
+    map_ids = point_cache
 
-    # Prepare rows
+    # Format each distinct timestamp once; points sampled together share them
+    ts_isos = {ms: ms_to_iso(ms) for ms in set(samples.ts)}
+
+    # Deduplicate on (point_id, ts) in the same pass; last sample wins
     total = 0
-    rows = []
-    for s in samples:
-        pid = map_ids.get(s["point_name"])  # type: ignore
-        ts_ms = int(s["timestamp"])  # milliseconds
-        # Filter non-finite values (NaN/Inf)
-        try:
-            val = float(s["value"])
-        except Exception:
-            continue
-        if not math.isfinite(val):
-            continue
+    kept = 0
+    deduped: Dict[Tuple[int, str], float] = {}
+    # Values are finite floats already: clean_page is the only producer of samples
+    for name, ts_ms, val in zip(samples.names, samples.ts, samples.vals):
+        pid = map_ids.get(name)
         if pid is None:
             continue
-        # Convert ms -> ISO timestamptz
-        ts_iso = iso(datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc))
-        rows.append({"point_id": pid, "ts": ts_iso, "value": val})
-
-    # Deduplicate rows by (point_id, ts)
-    deduped = {}
-    for row in rows:
-        key = (row["point_id"], row["ts"])
-        deduped[key] = row
-    unique_rows = list(deduped.values())
-
-    # Use INSERT with large batches (500) - much faster
-    for batch in chunk(unique_rows, 500):
+        kept += 1
+        deduped[(pid, ts_isos[ts_ms])] = val
+    dropped = kept - len(deduped)
+    if dropped:
+        print(f"      [Dedup] dropped {dropped}/{kept} duplicate (point_id, ts) rows ({dropped / kept:.1%})")
+    # Conflict-key order so each batch walks the (point_id, ts) index sequentially.
+    # Rows stay as tuples; JSON-shaped dicts are built one request batch at a time
+    unique_rows = sorted(deduped.items())
+    del deduped
+
+    if DATABASE_URL and unique_rows:
+        try:
+            return copy_timeseries(unique_rows)
+        except Exception as e:
+            print(f"[COPY] failed, falling back to PostgREST: {e}", file=sys.stderr)
+            _close_pg_connection()
+
+    # Use INSERT with large batches (1000) - much faster
+    for keyed in chunk(unique_rows, 1000):
+        batch = [{"point_id": pid, "ts": ts, "value": val} for (pid, ts), val in keyed]
         try:
             # Try insert - fastest path for new data
-            client.table("timeseries").insert(batch).execute()
+            write_timeseries_batch(client, batch)
             total += len(batch)
         except Exception:
             # If conflict (duplicate data), try upsert with larger batch (200)
             # This is critical for continuous sync where most data overlaps
             for mini_batch in chunk(batch, 200):
                 try:
-                    client.table("timeseries").upsert(mini_batch, on_conflict="point_id,ts").execute()
+                    write_timeseries_batch(client, mini_batch, upsert=True)
                     total += len(mini_batch)
                 except Exception as e:
                     # If still failing, go smaller but not tiny (50 instead of 10)
                     for tiny_batch in chunk(mini_batch, 50):
                         try:
-                            client.table("timeseries").upsert(tiny_batch, on_conflict="point_id,ts").execute()
+                            write_timeseries_batch(client, tiny_batch, upsert=True)
                             total += len(tiny_batch)
                         except Exception:
                             # Skip this batch if still failing - likely constraint violation
@@ -479,82 +725,128 @@ def run_backfill(
 
     print(f"[1/3] Pre-loading existing point IDs for {site}...")
     cache_start = time.time()
-    point_cache = load_all_point_ids(client, site)
+    point_cache = read_point_cache_file(site)
+    if point_cache:
+        print(f"      Using saved point map ({_point_cache_file(site)})")
+    else:
+        point_cache = load_all_point_ids(client, site)
     cache_time = time.time() - cache_start
     print(f"      OK Loaded {len(point_cache)} existing points ({cache_time:.1f}s)")
 
     window_end = end_dt
-    window_delta = timedelta(minutes=chunk_minutes)
-
-    print(f"\n[2/3] Fetching data from ACE API...")
-
-    chunk_num = 0
-    while processed < max_chunks and window_end > start_dt:
-        chunk_num += 1
-        window_start = max(start_dt, window_end - window_delta)
-        s_iso = iso(window_start)
-        e_iso = iso(window_end)
-
-        window_start_time = time.time()
-        print(f"\n   Chunk {chunk_num}/{max_chunks}: {s_iso} -> {e_iso}")
-
-        # Prefer point-chunked fetch to keep payload sizes small
-        point_names = get_point_names_from_supabase(client, site)
-        total_window_samples = 0
-        window_points = set()
-        if point_names:
-            for pn_chunk in chunk(point_names, 300):
-                use_cli = os.environ.get("USE_ACE_CLI", "0") == "1"
-                if use_cli:
-                    samples = fetch_window_via_cli(site, s_iso, e_iso, ace_token, page_size, list(pn_chunk))
-                    # Retry with smaller pages if nothing returned
-                    if not samples:
-                        # second CLI attempt with smaller page size, then HTTP fallback
-                        samples = fetch_window_via_cli(site, s_iso, e_iso, ace_token, max(5000, int(page_size*0.6)), list(pn_chunk))
-                        if not samples:
-                            samples = fetch_paginated_window(
-                                site, s_iso, e_iso, ace_token, page_size=max(5000, int(page_size*0.6)), point_names=list(pn_chunk)
-                            )
-                else:
-                    samples = fetch_paginated_window(
-                        site, s_iso, e_iso, ace_token, page_size=page_size, point_names=list(pn_chunk)
-                    )
-                if samples:
-                    # Track unique points
-                    for s in samples:
-                        if s.get("point_name"):
-                            window_points.add(s["point_name"])
-                            total_points_discovered.add(s["point_name"])
-
-                    ins = upsert_timeseries(client, site, samples, point_cache)
-                    inserted += ins
-                    total_window_samples += len(samples)
-                    total_samples_fetched += len(samples)
-        else:
-            # Fallback to site-wide fetch if no names cached in Supabase
-            samples = fetch_paginated_window(
-                site, s_iso, e_iso, ace_token, page_size=page_size
-            )
+    base_delta = timedelta(minutes=chunk_minutes)
+    window_delta = base_delta
+    consecutive_empty = 0
+
+    def windows():
+        """Walk (window_start, window_end) pairs from end -> start at the current window size."""
+        window_end = end_dt
+        while window_end > start_dt:
+            window_start = max(start_dt, window_end - window_delta)
+            yield window_start, window_end
+            window_end = window_start
+
+    use_cli = os.environ.get("USE_ACE_CLI", "0") == "1"
+    # Prefer point-chunked fetch to keep payload sizes small. point_cache was
+    # loaded with full pagination, so it already holds every known name
+    point_names = sorted(point_cache)
+
+    def fetch_subset(s_iso: str, e_iso: str, pn_chunk: Optional[List[str]] = None) -> SampleBatch:
+        """Fetch one point-name subset of a window (or the whole site when pn_chunk is None)."""
+        try:
+            return fetch_paginated_window(site, s_iso, e_iso, ace_token, page_size=page_size, point_names=pn_chunk)
+        except Exception:
+            if not use_cli:
+                raise
+            # Last resort only: a subprocess per call costs far more than the HTTP path
+            return fetch_window_via_cli(site, s_iso, e_iso, ace_token, max(5000, int(page_size*0.6)), pn_chunk)
+
+    def fetch_window(s_iso: str, e_iso: str) -> SampleBatch:
+        """Fetch one window from ACE. Runs on a worker thread; no DB writes here."""
+        if not point_names or not _ace_supports_point_names(ACE_BASE_DEFAULT):
+            # Site-wide fetch if no names are cached, or if the API would ignore
+            # point_names and return the whole site for every subset anyway
+            return fetch_subset(s_iso, e_iso)
+        window_samples = SampleBatch()
+        subsets = [list(pn_chunk) for pn_chunk in chunk(point_names, 300)]
+        for samples in subset_pool.map(lambda pn: fetch_subset(s_iso, e_iso, pn), subsets):
+            window_samples.extend(samples)
+        return window_samples
+
+    print(f"\n[2/3] Fetching data from ACE API ({ACE_WINDOW_WORKERS} windows in flight)...")
+
+    in_flight = {}
+    writes = set()
+    pending = SampleBatch()
+
+    def collect_writes(return_when) -> None:
+        nonlocal inserted
+        done, _ = wait(writes, return_when=return_when)
+        for fut in done:
+            writes.discard(fut)
+            inserted += fut.result()
+
+    def flush() -> None:
+        """Hand coalesced samples to a writer: one points pass for the union of names, then big batches."""
+        nonlocal pending
+        if pending:
+            writes.add(writer.submit(upsert_timeseries, client, site, pending, point_cache))
+            pending = SampleBatch()
+            # Don't let fetched batches queue up faster than the writers drain them
+            if len(writes) > SUPABASE_WRITE_WORKERS:
+                collect_writes(FIRST_COMPLETED)
+
+    def drain(return_when) -> None:
+        """Collect finished windows and queue their samples for writing."""
+        nonlocal processed, total_samples_fetched, window_delta, consecutive_empty
+        done, _ = wait(in_flight, return_when=return_when)
+        for fut in done:
+            chunk_num, window_start_time = in_flight.pop(fut)
+            samples = fut.result()
+            window_points = set(samples.names)
+            # Sparse stretches: widen windows after repeated empties, snap back on the next hit
+            if samples:
+                consecutive_empty = 0
+                window_delta = base_delta
+            else:
+                consecutive_empty += 1
+                if consecutive_empty >= EMPTY_WINDOWS_BEFORE_WIDEN and window_delta < MAX_WIDENED_WINDOW:
+                    window_delta = min(window_delta * 2, MAX_WIDENED_WINDOW)
+                    consecutive_empty = 0
+                    print(f"      --> Empty windows, widening to {window_delta.total_seconds() / 60:.0f} minutes")
             if samples:
                 # Track unique points
-                for s in samples:
-                    if s.get("point_name"):
-                        window_points.add(s["point_name"])
-                        total_points_discovered.add(s["point_name"])
-
-                ins = upsert_timeseries(client, site, samples, point_cache)
-                inserted += ins
-                total_window_samples = len(samples)
+                total_points_discovered.update(window_points)
+                pending.extend(samples)
                 total_samples_fetched += len(samples)
-
-        window_time = time.time() - window_start_time
-        elapsed = time.time() - start_time
-
-        print(f"      --> Chunk complete: {total_window_samples} samples, {len(window_points)} unique points ({window_time:.1f}s)")
-        print(f"      --> Total progress: {total_samples_fetched} samples, {len(total_points_discovered)} points, {inserted} inserted ({elapsed:.1f}s elapsed)")
-
-        processed += 1
-        window_end = window_start
+                if len(pending) >= COALESCE_ROWS:
+                    flush()
+
+            window_time = time.time() - window_start_time
+            elapsed = time.time() - start_time
+
+            print(f"      --> Chunk {chunk_num} complete: {len(samples)} samples, {len(window_points)} unique points ({window_time:.1f}s)")
+            print(f"      --> Total progress: {total_samples_fetched} samples, {len(total_points_discovered)} points, {inserted} inserted ({elapsed:.1f}s elapsed)")
+            processed += 1
+
+    with ThreadPoolExecutor(max_workers=SUPABASE_WRITE_WORKERS) as writer, \
+            ThreadPoolExecutor(max_workers=ACE_SUBSET_WORKERS) as subset_pool, \
+            ThreadPoolExecutor(max_workers=ACE_WINDOW_WORKERS) as pool:
+        for chunk_num, (window_start, window_end) in enumerate(islice(windows(), max_chunks), 1):
+            s_iso = iso(window_start)
+            e_iso = iso(window_end)
+            print(f"\n   Chunk {chunk_num}/{max_chunks}: {s_iso} -> {e_iso}")
+            in_flight[pool.submit(fetch_window, s_iso, e_iso)] = (chunk_num, time.time())
+            # Bound in-flight windows so results are collected as they arrive
+            if len(in_flight) >= ACE_WINDOW_WORKERS:
+                drain(FIRST_COMPLETED)
+            window_end = window_start
+        while in_flight:
+            drain(FIRST_COMPLETED)
+        flush()
+        while writes:
+            collect_writes(FIRST_COMPLETED)
+    write_point_cache_file(site, point_cache)
 
     # Persist new resume cursor for deep backfill
     if update_state:
@@ -615,6 +907,7 @@ def main():
             end_dt = parse_iso(cur)
             stateful = True
         else:
+            # Only a cold start pays for the earliest-ts query (a timeseries/points join)
             earliest_ms = get_site_earliest_ts(supabase_url, supabase_key, args.site)
             end_dt = datetime.fromtimestamp(earliest_ms / 1000, tz=timezone.utc) if earliest_ms else now
             stateful = True
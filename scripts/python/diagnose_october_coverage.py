@@ -8,12 +8,26 @@ B) System issue (we didn't request it correctly)
 """
 import os
 import sys
+import orjson
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 ACE_TOKEN = os.environ.get("ACE_API_KEY")
 ACE_BASE = "https://flightdeck.aceiot.cloud/api"
 SITE = "ses_falls_city"
+CONFIGURED_POINTS_WORKERS = 8
+
+# One keep-alive session for every request below
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_maxsize=CONFIGURED_POINTS_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"])),
+))
+session.headers["authorization"] = f"Bearer {ACE_TOKEN}"
 
 print("=" * 80)
 print("OCTOBER DATA AVAILABILITY DIAGNOSTIC")
@@ -42,12 +56,10 @@ while True:
     if cursor:
         params["cursor"] = cursor
 
-    headers = {"authorization": f"Bearer {ACE_TOKEN}"}
-
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=180)
+        r = session.get(url, params=params, timeout=180)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
 
         samples = data.get("point_samples", [])
         all_samples.extend(samples)
@@ -80,35 +92,47 @@ print()
 # Fetch configured points
 print("[2/3] Fetching ALL configured points...")
 configured = []
-page = 1
 
-while True:
-    url = f"{ACE_BASE}/sites/{SITE}/configured_points?page={page}&per_page=1000"
-    headers = {"authorization": f"Bearer {ACE_TOKEN}"}
 
-    try:
-        r = requests.get(url, headers=headers, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("items", [])
-        
-        if not items:
-            break
-            
-        for item in items:
-            name = item.get("name")
-            if name:
-                configured.append(name)
-        
+def fetch_configured_page(page):
+    r = session.get(f"{ACE_BASE}/sites/{SITE}/configured_points?page={page}&per_page=1000", timeout=60)
+    r.raise_for_status()
+    return orjson.loads(r.content).get("items", [])
+
+
+def add_page(page, items):
+    """Record a page; returns True when it was the last one."""
+    for item in items:
+        name = item.get("name")
+        if name:
+            configured.append(name)
+    if items:
         print(f"   Page {page}: {len(items)} points (total: {len(configured)})")
-        
-        if len(items) < 1000:
-            break
-        page += 1
-        
-    except Exception as e:
-        print(f"   ERROR: {e}")
-        break
+    return len(items) < 1000
+
+
+# Page 1 first; later pages are independent, so fetch them in parallel batches
+# and stop at the first short page
+try:
+    done = add_page(1, fetch_configured_page(1))
+except Exception as e:
+    print(f"   ERROR: {e}")
+    done = True
+
+next_page = 2
+with ThreadPoolExecutor(max_workers=CONFIGURED_POINTS_WORKERS) as executor:
+    while not done:
+        pages = range(next_page, next_page + CONFIGURED_POINTS_WORKERS)
+        futures = [executor.submit(fetch_configured_page, page) for page in pages]
+        for page, future in zip(pages, futures):
+            try:
+                done = add_page(page, future.result())
+            except Exception as e:
+                print(f"   ERROR: {e}")
+                done = True
+            if done:
+                break
+        next_page += CONFIGURED_POINTS_WORKERS
 
 print()
 print(f"✓ Total configured points: {len(configured)}")
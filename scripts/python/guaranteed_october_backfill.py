@@ -23,51 +23,140 @@ import argparse
 import os
 import sys
 import time
-from datetime import datetime, timezone
-from typing import List, Dict
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import List, Dict, Optional, Tuple
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from postgrest import ReturnMethod
 from supabase import create_client, Client
 import math
 
 ACE_BASE = os.environ.get("ACE_API_BASE", "https://flightdeck.aceiot.cloud/api")
+# Point batches requested from ACE concurrently; each batch is one slow POST
+ACE_FETCH_WORKERS = int(os.environ.get("ACE_FETCH_WORKERS", "8"))
+# Optional direct Postgres connection string; enables COPY instead of PostgREST
+DATABASE_URL = (
+    os.environ.get("DATABASE_URL")
+    or os.environ.get("SUPABASE_DB_URL")
+    or os.environ.get("SUPABASE_PG_URL")
+)
+# Point batch sizes tried by the startup probe: the first one get_timeseries accepts wins
+MAX_POINT_BATCH = 1000
+MIN_POINT_BATCH = 100
+# Upsert collected rows whenever this many are buffered, to bound memory
+FLUSH_ROWS = 200_000
+# Optional directory for a per-site name -> id snapshot reused across runs
+POINT_CACHE_DIR = os.environ.get("BACKFILL_POINT_CACHE_DIR")
+# Snapshots older than this are reloaded from Supabase
+POINT_CACHE_TTL_SECONDS = 24 * 3600
+
+
+def build_ace_session(ace_token: str) -> requests.Session:
+    """Keep-alive session with retry/backoff, shared by every ACE request in a run."""
+    # get_timeseries is a read-only query sent as POST, so retrying it is safe.
+    # Throttling is left to 429 + Retry-After rather than a fixed sleep per batch.
+    retry_kwargs = dict(total=5, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=frozenset(["GET", "POST"]),
+                        respect_retry_after_header=True)
+    try:
+        # Jitter keeps concurrent batches from retrying in lockstep (urllib3 >= 2)
+        retry = Retry(backoff_jitter=0.5, **retry_kwargs)
+    except TypeError:
+        retry = Retry(**retry_kwargs)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(32, ACE_FETCH_WORKERS),
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "authorization": f"Bearer {ace_token}",
+        "accept": "application/json",
+    })
+    return session
 
 
-def fetch_all_configured_point_names(site: str, ace_token: str, ace_base: str) -> List[str]:
-    """Fetch ALL configured point names."""
-    points = []
-    page = 1
-    per_page = 1000
+class SampleBatch:
+    """Fetched samples as parallel columns: point name, epoch ms and value.
 
-    print(f"[1/4] Fetching ALL configured point names from ACE API...")
+    Replaces one {point_name, timestamp, value} dict per sample; ts/vals are
+    typed arrays, so a batch costs three containers instead of N dicts.
+    """
 
-    while True:
-        url = f"{ace_base}/sites/{site}/configured_points?page={page}&per_page={per_page}"
-        headers = {"authorization": f"Bearer {ace_token}"}
+    __slots__ = ("names", "ts", "vals")
 
-        try:
-            r = requests.get(url, headers=headers, timeout=60)
-            r.raise_for_status()
-            data = r.json()
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.ts = array("q")
+        self.vals = array("d")
 
-            items = data.get("items", [])
-            if not items:
-                break
+    def __len__(self) -> int:
+        return len(self.ts)
 
-            for item in items:
-                name = item.get("name")
-                if name:
-                    points.append(name)
+    def append(self, name: str, ts: int, val: float) -> None:
+        # ts first: it is the only column that can reject a value (out of int64 range)
+        self.ts.append(ts)
+        self.vals.append(val)
+        self.names.append(name)
 
-            print(f"   Page {page}: {len(items)} points (total: {len(points)})")
 
-            if len(items) < per_page:
-                break
+def fetch_configured_points_page(site: str, page: int, per_page: int, ace_token: str, ace_base: str,
+                                 session: Optional[requests.Session] = None) -> List[Dict]:
+    """Fetch one page of configured points."""
+    url = f"{ace_base}/sites/{site}/configured_points?page={page}&per_page={per_page}"
+    headers = {"authorization": f"Bearer {ace_token}"}
+    r = (session or requests).get(url, headers=headers, timeout=60)
+    r.raise_for_status()
+    return orjson.loads(r.content).get("items", [])
 
-            page += 1
 
-        except Exception as e:
-            print(f"   Error on page {page}: {e}", file=sys.stderr)
-            break
+def fetch_all_configured_point_names(site: str, ace_token: str, ace_base: str,
+                                     session: Optional[requests.Session] = None) -> List[str]:
+    """Fetch ALL configured point names."""
+    points = []
+    per_page = 1000
+
+    print(f"[1/4] Fetching ALL configured point names from ACE API...")
+
+    def add_page(page: int, items: List[Dict]) -> bool:
+        """Record a page; returns True when it was the last one."""
+        for item in items:
+            name = item.get("name")
+            if name:
+                points.append(name)
+        if items:
+            print(f"   Page {page}: {len(items)} points (total: {len(points)})")
+        return len(items) < per_page
+
+    try:
+        done = add_page(1, fetch_configured_points_page(site, 1, per_page, ace_token, ace_base, session))
+    except Exception as e:
+        print(f"   Error on page 1: {e}", file=sys.stderr)
+        done = True
+
+    # Pages are independent, so fetch them in batches and stop at the first short page
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=ACE_FETCH_WORKERS) as executor:
+        while not done:
+            pages = range(next_page, next_page + ACE_FETCH_WORKERS)
+            futures = [
+                executor.submit(fetch_configured_points_page, site, page, per_page, ace_token, ace_base, session)
+                for page in pages
+            ]
+            for page, future in zip(pages, futures):
+                try:
+                    done = add_page(page, future.result())
+                except Exception as e:
+                    print(f"   Error on page {page}: {e}", file=sys.stderr)
+                    done = True
+                if done:
+                    break
+            next_page += ACE_FETCH_WORKERS
 
     print(f"   OK Total: {len(points)} configured points")
     print()
@@ -79,8 +168,9 @@ def fetch_timeseries_for_points_batch(
     start_iso: str,
     end_iso: str,
     ace_token: str,
-    ace_base: str
-) -> List[Dict]:
+    ace_base: str,
+    session: Optional[requests.Session] = None
+) -> Optional[SampleBatch]:
     """
     Fetch timeseries data for a batch of points using POST /points/get_timeseries.
     """
@@ -97,12 +187,12 @@ def fetch_timeseries_for_points_batch(
         "end_time": end_iso
     }
 
-    samples = []
+    samples = SampleBatch()
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=180)
+        r = (session or requests).post(url, headers=headers, data=orjson.dumps(payload), timeout=180)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
 
         # Parse response (format may vary)
         if isinstance(data, dict):
@@ -112,6 +202,9 @@ def fetch_timeseries_for_points_batch(
         else:
             point_samples = []
 
+        # Every point polled at the same instant repeats the same timestamp string,
+        # so parse each distinct one once
+        parsed_times = {}
         for sample in point_samples:
             point_name = sample.get("name") or sample.get("point") or sample.get("point_name")
             ts = sample.get("time") or sample.get("timestamp") or sample.get("ts")
@@ -123,19 +216,17 @@ def fetch_timeseries_for_points_batch(
                     if isinstance(ts, int):
                         ts_ms = ts
                     else:
-                        ts_dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
-                        ts_ms = int(ts_dt.timestamp() * 1000)
+                        ts_ms = parsed_times.get(ts)
+                        if ts_ms is None:
+                            ts_dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+                            ts_ms = parsed_times[ts] = int(ts_dt.timestamp() * 1000)
 
                     # Validate value
                     val = float(value)
                     if not math.isfinite(val):
                         continue
 
-                    samples.append({
-                        "point_name": point_name,
-                        "timestamp": ts_ms,
-                        "value": val
-                    })
+                    samples.append(point_name, ts_ms, val)
                 except Exception:
                     continue
 
@@ -150,52 +241,271 @@ def fetch_timeseries_for_points_batch(
     return samples
 
 
-def upsert_samples_to_supabase(
-    client: Client,
-    site: str,
-    samples: List[Dict],
-    batch_size: int = 1000
+def probe_point_batch_size(
+    point_names: List[str],
+    start_iso: str,
+    ace_token: str,
+    ace_base: str,
+    session: Optional[requests.Session] = None
 ) -> int:
-    """Upsert samples into Supabase timeseries table."""
-    if not samples:
-        return 0
+    """
+    Find the largest point_names batch get_timeseries accepts, starting at
+    MAX_POINT_BATCH and halving on 400/413. Probes ask for one minute of data.
+    """
+    url = f"{ace_base}/points/get_timeseries"
+    headers = {
+        "authorization": f"Bearer {ace_token}",
+        "Content-Type": "application/json",
+        "accept": "application/json"
+    }
+    start_dt = datetime.fromisoformat(start_iso.replace("Z", "+00:00"))
+    end_iso = (start_dt + timedelta(minutes=1)).isoformat().replace("+00:00", "Z")
 
-    # Get point_id mapping
-    point_map = {}
+    size = min(MAX_POINT_BATCH, max(len(point_names), 1))
+    while size > MIN_POINT_BATCH:
+        payload = {"point_names": point_names[:size], "start_time": start_iso, "end_time": end_iso}
+        try:
+            r = (session or requests).post(url, headers=headers, data=orjson.dumps(payload), timeout=60)
+        except Exception as e:
+            print(f"   Batch size probe failed: {e}", file=sys.stderr)
+            break
+        if r.status_code not in (400, 413):
+            # Success, or an error (e.g. 404) the batch loop reports itself
+            return size
+        size //= 2
+    return MIN_POINT_BATCH
+
+
+def copy_timeseries(rows: List[Tuple[int, int, float]]) -> int:
+    """COPY (point_id, epoch ms, value) rows into a temp table, then merge with one INSERT ... ON CONFLICT.
+
+    Timestamps travel as epoch ms and are converted by Postgres, so no
+    datetime or ISO string is built per row.
+    """
+    import psycopg
+    with psycopg.connect(DATABASE_URL) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE ts_stage "
+                "(point_id bigint, ts_ms bigint, value double precision) "
+                "ON COMMIT DROP"
+            )
+            with cur.copy("COPY ts_stage (point_id, ts_ms, value) FROM STDIN") as copy:
+                for r in rows:
+                    copy.write_row(r)
+            # Rows arrive deduplicated and sorted, so no DISTINCT ON / ORDER BY here
+            cur.execute(
+                "INSERT INTO timeseries (point_id, ts, value) "
+                "SELECT point_id, to_timestamp(ts_ms / 1000.0), value FROM ts_stage "
+                "ON CONFLICT (point_id, ts) DO UPDATE SET value = EXCLUDED.value"
+            )
+    return len(rows)
+
+
+def _timeseries_is_hypertable(conn) -> bool:
+    """True when timeseries is a TimescaleDB hypertable (no CONCURRENTLY index DDL there)."""
+    has_timescale = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')"
+    ).fetchone()[0]
+    if not has_timescale:
+        return False
+    return conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM timescaledb_information.hypertables "
+        "WHERE hypertable_name = 'timeseries')"
+    ).fetchone()[0]
+
+
+def drop_secondary_timeseries_indexes() -> List[str]:
+    """
+    Drop every non-unique index on timeseries and return their definitions.
+
+    The primary key / unique (point_id, ts) index stays, since ON CONFLICT
+    needs it. Only used behind --drop-indexes for one-shot bulk loads.
+    """
+    import psycopg
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        concurrently = "" if _timeseries_is_hypertable(conn) else "CONCURRENTLY "
+        indexes = conn.execute(
+            "SELECT x.indexrelid::regclass::text, pg_get_indexdef(x.indexrelid) "
+            "FROM pg_index x "
+            "WHERE x.indrelid = 'timeseries'::regclass AND NOT x.indisunique AND NOT x.indisprimary"
+        ).fetchall()
+        dropped = []
+        try:
+            for name, definition in indexes:
+                # Printed first so the index can be recreated by hand if the run dies
+                print(f"   Dropping index: {definition}")
+                # regclass::text is already a quoted, schema-qualified identifier
+                conn.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
+                dropped.append(definition)
+        except Exception:
+            # Don't leave a half-dropped set behind
+            rebuild_timeseries_indexes(dropped)
+            raise
+    return dropped
+
+
+def rebuild_timeseries_indexes(definitions: List[str]) -> None:
+    """
+    Recreate indexes dropped by drop_secondary_timeseries_indexes().
+
+    Raises RuntimeError listing the statements still to run by hand if any
+    index could not be rebuilt.
+    """
+    if not definitions:
+        return
+    import psycopg
+    print(f"   Rebuilding {len(definitions)} timeseries index(es)...")
+    failed = []
+    try:
+        with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+            prefix = "CREATE INDEX IF NOT EXISTS " if _timeseries_is_hypertable(conn) \
+                else "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            for definition in definitions:
+                try:
+                    conn.execute(definition.replace("CREATE INDEX ", prefix, 1))
+                except psycopg.Error as e:
+                    print(f"   ERROR rebuilding index: {e}", file=sys.stderr)
+                    failed.append(definition)
+    except psycopg.Error as e:
+        print(f"   ERROR connecting to rebuild indexes: {e}", file=sys.stderr)
+        failed = list(definitions)
+    if failed:
+        print("   timeseries is missing these indexes; recreate them manually:", file=sys.stderr)
+        for definition in failed:
+            print(f"     {definition};", file=sys.stderr)
+        raise RuntimeError(f"{len(failed)} timeseries index(es) were not rebuilt")
+
+
+def _is_payload_too_large(e: Exception) -> bool:
+    """True for a 413 from PostgREST or the gateway in front of it."""
+    return str(getattr(e, "code", "")) == "413" or "Payload Too Large" in str(e)
+
+
+def upsert_timeseries_chunk(client: Client, chunk: List[Dict]) -> int:
+    """Upsert one chunk without echoing rows back, halving it on 413 until it fits."""
     try:
-        res = client.table("points").select("id,name").eq("site_name", site).execute()
+        client.table("timeseries").upsert(
+            chunk,
+            on_conflict="point_id,ts",
+            returning=ReturnMethod.minimal
+        ).execute()
+        return len(chunk)
+    except Exception as e:
+        if len(chunk) > 1 and _is_payload_too_large(e):
+            mid = len(chunk) // 2
+            return upsert_timeseries_chunk(client, chunk[:mid]) + upsert_timeseries_chunk(client, chunk[mid:])
+        raise
+
+
+def load_point_map(client: Client, site: str, page_size: int = 1000) -> Dict[str, int]:
+    """Load name -> id for every point of the site, paging past PostgREST's row cap.
+
+    Pages are keyed on the last id seen rather than an offset, so each page is
+    an index range scan instead of re-skipping every earlier row.
+    """
+    point_map = {}
+    last_id = None
+    while True:
+        query = client.table("points").select("id,name").eq("site_name", site)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        res = query.order("id").limit(page_size).execute()
         for row in res.data:
             point_map[row["name"]] = row["id"]
-    except Exception as e:
-        print(f"   Error fetching point IDs: {e}", file=sys.stderr)
-        return 0
+        if len(res.data) < page_size:
+            return point_map
+        last_id = res.data[-1]["id"]
+
 
-    # Convert to timeseries rows
+def _point_cache_file(site: str) -> Optional[str]:
+    if not POINT_CACHE_DIR:
+        return None
+    return os.path.join(POINT_CACHE_DIR, f"points_{site}.json")
+
+
+def read_point_cache_file(site: str) -> Dict[str, int]:
+    """Return the saved name -> id map for site, or {} when disabled/missing/stale/corrupt."""
+    path = _point_cache_file(site)
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        if time.time() - os.path.getmtime(path) > POINT_CACHE_TTL_SECONDS:
+            return {}
+        with open(path, "rb") as f:
+            return {str(k): int(v) for k, v in orjson.loads(f.read()).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def write_point_cache_file(site: str, point_map: Dict[str, int]) -> None:
+    path = _point_cache_file(site)
+    if not path:
+        return
+    try:
+        os.makedirs(POINT_CACHE_DIR, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(point_map))
+    except OSError as e:
+        print(f"   Failed to save point cache {path}: {e}", file=sys.stderr)
+
+
+def samples_to_rows(samples: SampleBatch, point_map: Dict[str, int]) -> List[Tuple[int, int, float]]:
+    """Translate fetched samples into (point_id, epoch ms, value) rows, dropping points not in the database."""
     rows = []
-    for s in samples:
-        pname = s["point_name"]
-        if pname not in point_map:
+    append = rows.append
+    lookup = point_map.get
+    for name, ts_ms, value in zip(samples.names, samples.ts, samples.vals):
+        point_id = lookup(name)
+        if point_id is None:
             continue  # Skip points not in database
+        append((point_id, ts_ms, value))
+    return rows
 
-        rows.append({
-            "point_id": point_map[pname],
-            "ts": datetime.fromtimestamp(s["timestamp"] / 1000, tz=timezone.utc).isoformat(),
-            "value": s["value"]
-        })
 
+def rows_to_records(rows: List[Tuple[int, int, float]], ts_isos: Dict[int, str]) -> List[Dict]:
+    """Build PostgREST row dicts, formatting each distinct timestamp once via ts_isos."""
+    records = []
+    for point_id, ts_ms, value in rows:
+        ts_iso = ts_isos.get(ts_ms)
+        if ts_iso is None:
+            ts_iso = ts_isos[ts_ms] = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat()
+        records.append({"point_id": point_id, "ts": ts_iso, "value": value})
+    return records
+
+
+def upsert_rows_to_supabase(
+    client: Client,
+    rows: List[Tuple[int, int, float]],
+    batch_size: int = 10000
+) -> int:
+    """Upsert timeseries rows into Supabase, via COPY when a Postgres URL is set.
+
+    Rows are deduplicated on (point_id, ts), keeping the last value, and sorted so
+    the primary-key index sees sequential inserts. A statement must not hit the
+    same key twice under ON CONFLICT / merge-duplicates anyway.
+    """
     if not rows:
         return 0
 
-    # Batch upsert
+    deduped = {(point_id, ts_ms): value for point_id, ts_ms, value in rows}
+    if len(deduped) < len(rows):
+        print(f"   Dropped {len(rows) - len(deduped)} duplicate samples")
+    rows = [(point_id, ts_ms, value) for (point_id, ts_ms), value in sorted(deduped.items())]
+
+    if DATABASE_URL:
+        try:
+            return copy_timeseries(rows)
+        except Exception as e:
+            print(f"   COPY failed, falling back to REST upsert: {e}", file=sys.stderr)
+
+    # Batch upsert; dicts are only built for the chunk in flight
     inserted = 0
+    ts_isos = {}
     for i in range(0, len(rows), batch_size):
-        chunk = rows[i:i + batch_size]
+        chunk = rows_to_records(rows[i:i + batch_size], ts_isos)
         try:
-            client.table("timeseries").upsert(
-                chunk,
-                on_conflict="point_id,ts"
-            ).execute()
-            inserted += len(chunk)
+            inserted += upsert_timeseries_chunk(client, chunk)
         except Exception as e:
             print(f"   Error upserting chunk: {e}", file=sys.stderr)
 
@@ -207,7 +517,11 @@ def main():
     parser.add_argument("--site", required=True, help="Site name")
     parser.add_argument("--start", required=True, help="Start time (ISO8601)")
     parser.add_argument("--end", required=True, help="End time (ISO8601)")
-    parser.add_argument("--batch-size", type=int, default=100, help="Points per batch")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Points per batch (default: largest size the API accepts)")
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="Drop secondary timeseries indexes during the load and rebuild them "
+                             "afterwards (needs DATABASE_URL; for one-shot bulk backfills only)")
     args = parser.parse_args()
 
     # Get credentials
@@ -220,7 +534,12 @@ def main():
         print("ERROR: Missing environment variables", file=sys.stderr)
         sys.exit(1)
 
+    if args.drop_indexes and not DATABASE_URL:
+        print("ERROR: --drop-indexes needs DATABASE_URL (or SUPABASE_DB_URL)", file=sys.stderr)
+        sys.exit(1)
+
     client = create_client(supabase_url, supabase_key)
+    ace_session = build_ace_session(ace_token)
 
     print("=" * 80)
     print("GUARANTEED OCTOBER BACKFILL - ALL 7,327 POINTS")
@@ -228,66 +547,126 @@ def main():
     print()
     print(f"Site: {args.site}")
     print(f"Time range: {args.start} to {args.end}")
-    print(f"Batch size: {args.batch_size} points")
+    print(f"Batch size: {args.batch_size or 'auto'} points")
     print()
 
-    # Fetch all point names
-    all_points = fetch_all_configured_point_names(args.site, ace_token, ace_base)
+    # Fetch all point names, and the ids Supabase already has for them
+    all_points = fetch_all_configured_point_names(args.site, ace_token, ace_base, ace_session)
 
     if not all_points:
         print("ERROR: No points found!", file=sys.stderr)
         sys.exit(1)
 
+    if args.batch_size is None:
+        args.batch_size = probe_point_batch_size(all_points, args.start, ace_token, ace_base, ace_session)
+        print(f"   OK API accepts {args.batch_size} points per request")
+        print()
+
     # Process in batches
-    print(f"[2/4] Fetching data for {len(all_points)} points in batches of {args.batch_size}...")
+    print(f"[2/4] Fetching data for {len(all_points)} points in batches of {args.batch_size} "
+          f"({ACE_FETCH_WORKERS} in flight)...")
     print()
 
-    all_samples = []
-    points_with_data = set()
-    num_batches = (len(all_points) + args.batch_size - 1) // args.batch_size
-
-    for i in range(0, len(all_points), args.batch_size):
-        batch_num = (i // args.batch_size) + 1
-        batch = all_points[i:i + args.batch_size]
-
-        print(f"   Batch {batch_num}/{num_batches}: Fetching {len(batch)} points...")
-
-        samples = fetch_timeseries_for_points_batch(
-            batch, args.start, args.end, ace_token, ace_base
-        )
-
-        if samples is None:
-            print(f"   ERROR: POST /points/get_timeseries not available!")
-            print(f"   Falling back to paginated endpoint (may not get all points)")
-            # TODO: Implement fallback
+    point_map = read_point_cache_file(args.site)
+    if point_map:
+        print(f"   OK {len(point_map)} point IDs loaded from cache")
+    else:
+        try:
+            point_map = load_point_map(client, args.site)
+        except Exception as e:
+            print(f"ERROR: Could not load point IDs: {e}", file=sys.stderr)
             sys.exit(1)
-
-        if samples:
-            # Collect samples for upsert
-            all_samples.extend(samples)
-
-            # Track which points have data
-            for s in samples:
-                points_with_data.add(s["point_name"])
-
-            print(f"   → Got {len(samples)} samples ({len(points_with_data)} points with data so far)")
-
-        time.sleep(0.1)  # Rate limiting
-
-    total_samples = len(all_samples)
-    print()
-    print(f"   OK Fetched {total_samples} total samples")
-    print(f"   OK {len(points_with_data)} points have data ({(len(points_with_data)/len(all_points)*100):.1f}%)")
+        write_point_cache_file(args.site, point_map)
+        print(f"   OK {len(point_map)} points already in Supabase")
     print()
 
-    # Upsert to Supabase
-    print(f"[3/4] Upserting {total_samples} samples to Supabase...")
-    if total_samples > 0:
-        inserted = upsert_samples_to_supabase(client, args.site, all_samples, batch_size=1000)
-        print(f"   OK Upserted {inserted} samples to Supabase")
-    else:
-        print(f"   WARNING: No samples to upsert")
-    print()
+    dropped_indexes = []
+    if args.drop_indexes:
+        dropped_indexes = drop_secondary_timeseries_indexes()
+        print()
+
+    # Indexes come back however the load ends, including the sys.exit() paths below
+    try:
+        total_samples = 0
+        inserted = 0
+        pending_rows = []
+        # One upsert runs in the background while the next buffer fills from ACE
+        writer = ThreadPoolExecutor(max_workers=1)
+        write_future = None
+        points_with_data = set()
+        batches = [all_points[i:i + args.batch_size] for i in range(0, len(all_points), args.batch_size)]
+        num_batches = len(batches)
+
+        def fetch_batch(batch: List[str]):
+            return fetch_timeseries_for_points_batch(batch, args.start, args.end, ace_token, ace_base,
+                                                     ace_session)
+
+        pool = ThreadPoolExecutor(max_workers=ACE_FETCH_WORKERS)
+
+        def fetched_in_order():
+            """Yield (batch, samples) in batch order, keeping at most ACE_FETCH_WORKERS fetches outstanding.
+
+            A new batch is only submitted when one is taken, so finished results
+            can't pile up while the loop below waits on a write.
+            """
+            queued = iter(batches)
+            in_flight = deque((batch, pool.submit(fetch_batch, batch)) for batch in islice(queued, ACE_FETCH_WORKERS))
+            while in_flight:
+                batch, future = in_flight.popleft()
+                samples = future.result()
+                next_batch = next(queued, None)
+                if next_batch is not None:
+                    in_flight.append((next_batch, pool.submit(fetch_batch, next_batch)))
+                yield batch, samples
+
+        # Results come back in batch order, so progress output reads the same as the serial loop
+        for batch_num, (batch, samples) in enumerate(fetched_in_order(), 1):
+            print(f"   Batch {batch_num}/{num_batches}: Fetched {len(batch)} points")
+
+            if samples is None:
+                pool.shutdown(wait=False, cancel_futures=True)
+                writer.shutdown()
+                print(f"   ERROR: POST /points/get_timeseries not available!")
+                print(f"   Falling back to paginated endpoint (may not get all points)")
+                # TODO: Implement fallback
+                sys.exit(1)
+
+            if samples:
+                # Translate now so only point_id rows stay in memory
+                total_samples += len(samples)
+                pending_rows.extend(samples_to_rows(samples, point_map))
+                if len(pending_rows) >= FLUSH_ROWS:
+                    # Waiting on the previous write bounds memory to two buffers plus
+                    # at most ACE_FETCH_WORKERS fetched batches (see fetched_in_order)
+                    if write_future is not None:
+                        inserted += write_future.result()
+                    write_future = writer.submit(upsert_rows_to_supabase, client, pending_rows)
+                    pending_rows = []
+
+                # Track which points have data
+                points_with_data.update(samples.names)
+
+                print(f"   → Got {len(samples)} samples ({len(points_with_data)} points with data so far)")
+
+        pool.shutdown()
+        print()
+        print(f"   OK Fetched {total_samples} total samples")
+        print(f"   OK {len(points_with_data)} points have data ({(len(points_with_data)/len(all_points)*100):.1f}%)")
+        print()
+
+        # Upsert to Supabase
+        print(f"[3/4] Upserting remaining {len(pending_rows)} rows to Supabase...")
+        if write_future is not None:
+            inserted += write_future.result()
+        writer.shutdown()
+        if total_samples > 0:
+            inserted += upsert_rows_to_supabase(client, pending_rows)
+            print(f"   OK Upserted {inserted} samples to Supabase")
+        else:
+            print(f"   WARNING: No samples to upsert")
+        print()
+    finally:
+        rebuild_timeseries_indexes(dropped_indexes)
 
     # Summary
     print("[4/4] Summary:")
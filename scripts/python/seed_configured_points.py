@@ -12,6 +12,7 @@ import os
 import sys
 from typing import List, Dict
 import requests
+from postgrest import ReturnMethod
 from supabase import create_client, Client
 
 
@@ -74,6 +75,27 @@ def fetch_all_configured_points(site: str, ace_token: str, ace_base: str) -> Lis
     return points
 
 
+def _is_payload_too_large(e: Exception) -> bool:
+    """True for a 413 from PostgREST or the gateway in front of it."""
+    return str(getattr(e, "code", "")) == "413" or "Payload Too Large" in str(e)
+
+
+def upsert_points_chunk(client: Client, chunk: List[Dict]) -> int:
+    """Upsert one chunk of points without echoing rows back, halving it on 413 until it fits."""
+    try:
+        client.table("points").upsert(
+            chunk,
+            on_conflict="site_name,name",
+            returning=ReturnMethod.minimal
+        ).execute()
+        return len(chunk)
+    except Exception as e:
+        if len(chunk) > 1 and _is_payload_too_large(e):
+            mid = len(chunk) // 2
+            return upsert_points_chunk(client, chunk[:mid]) + upsert_points_chunk(client, chunk[mid:])
+        raise
+
+
 def upsert_points_to_supabase(client: Client, site: str, points: List[Dict]) -> int:
     """Upsert configured points into Supabase points table"""
     print(f"[Supabase] Upserting {len(points)} points...")
@@ -87,18 +109,14 @@ def upsert_points_to_supabase(client: Client, site: str, points: List[Dict]) ->
             "unit": p.get("unit")
         })
 
-    # Batch upsert in chunks of 500
+    # Batch upsert in chunks of 5000; point rows are small, and a 413 halves the chunk
     inserted = 0
-    chunk_size = 500
+    chunk_size = 5000
 
     for i in range(0, len(rows), chunk_size):
         chunk = rows[i:i + chunk_size]
         try:
-            client.table("points").upsert(
-                chunk,
-                on_conflict="site_name,name"
-            ).execute()
-            inserted += len(chunk)
+            inserted += upsert_points_chunk(client, chunk)
             print(f"[Supabase] Upserted {inserted}/{len(rows)} points...")
         except Exception as e:
             print(f"[Supabase] Error upserting chunk {i}: {e}", file=sys.stderr)
@@ -0,0 +1,22 @@
+"""
+Unit tests for backfill_october_all_points
+Run with: pytest scripts/python/test_backfill_october_all_points.py -v
+"""
+
+import backfill_october_all_points as backfill
+
+
+def test_build_point_index_skips_leading_nameless_sample():
+    """Test a nameless sample before any named one is skipped, not appended"""
+    samples = [
+        {"time": "2025-10-15T00:00:00Z", "value": 1.0},
+        {"name": "point1", "time": "2025-10-15T00:00:00Z", "value": 2.0},
+        {"point_name": "", "time": "2025-10-15T00:01:00Z", "value": 3.0},
+        {"name": "point1", "time": "2025-10-15T00:02:00Z", "value": 4.0},
+    ]
+
+    index = backfill.build_point_index(samples)
+
+    assert list(index) == ["point1"]
+    assert index["point1"].times == ["2025-10-15T00:00:00Z", "2025-10-15T00:02:00Z"]
+    assert list(index["point1"].values) == [2.0, 4.0]